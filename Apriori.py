@@ -1,70 +1,806 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import pandas as pd
+import numpy as np
+import os
+import json
+import pickle
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
-from typing import List, Dict, Union, Tuple, FrozenSet, Optional
+from typing import Callable, Iterator, List, Dict, Set, Union, Tuple, FrozenSet, Optional
+
+# Kho giao dịch dạng thưa (CSR): giao dịch t gồm các mã sản phẩm indices[indptr[t]:indptr[t + 1]],
+# order_ids[t] và items[i] giữ lại nhãn gốc của đơn hàng / sản phẩm đã được mã hóa thành số nguyên
+TransactionStore = Dict[str, object]
+# Dữ liệu giỏ hàng mà các thuật toán khai thác nhận vào: ma trận 0/1 (đơn hàng x sản phẩm) hoặc kho giao dịch
+BasketData = Union[pd.DataFrame, TransactionStore]
+
+# Đọc từng khối cặp (order_id, product_id) từ file Excel, CSV hoặc Parquet mà không nạp cả file vào bộ nhớ.
+# skip_rows: bỏ qua skip_rows dòng dữ liệu đầu tiên (sau dòng tiêu đề) mà không phân tích chúng thành DataFrame.
+# Mỗi dòng dữ liệu của file ứng với đúng một dòng của các khối (kể cả dòng thiếu giá trị), nên tổng số dòng
+# các khối là số dòng đã đọc
+def iter_transaction_chunks(file_path: str, chunk_size: int = 100_000, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    columns: List[str] = ['order_id', 'product_id']
+    extension: str = os.path.splitext(file_path)[1].lower()
+
+    if extension == ".csv":
+        header: List[str] = list(pd.read_csv(file_path, nrows=0).columns)
+        if not set(columns).issubset(header):
+            raise ValueError("File phải chứa các cột 'order_id' và 'product_id'.")
+        yield from pd.read_csv(file_path, header=None, names=header, skiprows=skip_rows + 1, usecols=columns,
+                               chunksize=chunk_size)
+
+    elif extension == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Cần cài đặt pyarrow để đọc file Parquet.")
+        parquet_file = pq.ParquetFile(file_path)
+        if not set(columns).issubset(parquet_file.schema_arrow.names):
+            raise ValueError("File phải chứa các cột 'order_id' và 'product_id'.")
+        # Bỏ qua nguyên các row group nằm trọn trong phần đã đọc, phần dư được cắt khỏi các lô đầu
+        row_groups: List[int] = []
+        for group in range(parquet_file.num_row_groups):
+            n_group_rows: int = parquet_file.metadata.row_group(group).num_rows
+            if not row_groups and skip_rows >= n_group_rows:
+                skip_rows -= n_group_rows
+            else:
+                row_groups.append(group)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=columns):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+
+    elif extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            sheet = workbook.active
+            header = list(next(sheet.iter_rows(max_row=1, values_only=True), ()))
+            if not set(columns).issubset(header):
+                raise ValueError("File Excel phải chứa các cột 'order_id' và 'product_id'.")
+            order_col: int = header.index('order_id')
+            product_col: int = header.index('product_id')
+            chunk: List[Tuple] = []
+            for row in sheet.iter_rows(min_row=skip_rows + 2, values_only=True):
+                chunk.append((row[order_col], row[product_col]))
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            workbook.close()
+
+    else:
+        raise ValueError(f"Định dạng file không được hỗ trợ: {extension}")
+
+# Mã hóa nhãn thành số nguyên liên tiếp, giữ bảng mã qua các khối
+def encode_labels(values: pd.Series, codes: Dict, labels: List) -> np.ndarray:
+    for value in pd.unique(values).tolist():
+        if value not in codes:
+            codes[value] = len(labels)
+            labels.append(value)
+    return values.map(codes).to_numpy(dtype=np.int64)
+
+# Xây kho giao dịch thưa từ file theo từng khối.
+# skip_rows: bỏ qua các dòng đã nạp ở lần trước (dùng khi cập nhật tăng dần); stats["n_rows"] là số dòng đã đọc
+# trace_memory: đo bộ nhớ đỉnh (MB) bằng tracemalloc trong lúc xây dựng; tracemalloc làm việc đọc file chậm đi
+# nhiều lần (nhất là Excel) nên mặc định tắt và khi đó peak_memory_mb là None
+def build_transaction_store(file_path: str, chunk_size: int = 100_000, skip_rows: int = 0,
+                            trace_memory: bool = False) -> TransactionStore:
+    tracing: bool = tracemalloc.is_tracing()
+    if trace_memory:
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    order_codes: Dict = {}
+    product_codes: Dict = {}
+    order_ids: List = []
+    items: List = []
+    pair_chunks: List[np.ndarray] = []
+    n_rows: int = 0
+    for chunk in iter_transaction_chunks(file_path, chunk_size, skip_rows):
+        n_rows += len(chunk)
+        chunk = chunk.dropna(subset=['order_id', 'product_id'])
+        orders: np.ndarray = encode_labels(chunk['order_id'], order_codes, order_ids)
+        products: np.ndarray = encode_labels(chunk['product_id'], product_codes, items)
+        pair_chunks.append(np.stack([orders, products]))
+
+    if not order_ids and not skip_rows:
+        raise ValueError("File không có dữ liệu giao dịch.")
+
+    # Gộp cặp (đơn hàng, sản phẩm) thành một khóa để vừa khử trùng lặp vừa sắp xếp theo đơn hàng
+    pairs: np.ndarray = np.concatenate(pair_chunks, axis=1) if pair_chunks else np.zeros((2, 0), dtype=np.int64)
+    del pair_chunks
+    n_items: int = max(len(items), 1)
+    keys: np.ndarray = np.unique(pairs[0] * n_items + pairs[1])
+    del pairs
+    transaction_of_pair: np.ndarray = keys // n_items
+    indices: np.ndarray = (keys % n_items).astype(np.int32)
+    indptr: np.ndarray = np.zeros(len(order_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(transaction_of_pair, minlength=len(order_ids)), out=indptr[1:])
+
+    peak_memory_mb: Optional[float] = None
+    if trace_memory:
+        peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if not tracing:
+            tracemalloc.stop()
+
+    return {
+        "order_ids": order_ids,
+        "items": items,
+        "indptr": indptr,
+        "indices": indices,
+        "stats": {"n_pairs": len(indices), "n_rows": n_rows, "peak_memory_mb": peak_memory_mb},
+    }
+
+# Chuyển ma trận 0/1 (đơn hàng x sản phẩm) sang kho giao dịch thưa
+def matrix_to_store(matrix: BasketData) -> TransactionStore:
+    if not isinstance(matrix, pd.DataFrame):
+        return matrix
+    rows, cols = np.nonzero(matrix.to_numpy() > 0)
+    indptr: np.ndarray = np.zeros(len(matrix) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(matrix)), out=indptr[1:])
+    return {
+        "order_ids": list(matrix.index),
+        "items": list(matrix.columns),
+        "indptr": indptr,
+        "indices": cols.astype(np.int32),
+        "stats": {"n_pairs": len(cols), "n_rows": len(matrix), "peak_memory_mb": None},
+    }
+
+# Lấy các giao dịch [start, stop) của kho giao dịch, giữ nguyên bảng mã sản phẩm
+def slice_transaction_store(store: TransactionStore, start: int, stop: int) -> TransactionStore:
+    indptr: np.ndarray = store["indptr"]
+    return {
+        "order_ids": store["order_ids"][start:stop],
+        "items": store["items"],
+        "indptr": indptr[start:stop + 1] - indptr[start],
+        "indices": store["indices"][indptr[start]:indptr[stop]],
+        "stats": store["stats"],
+    }
+
+def count_transactions(data: BasketData) -> int:
+    return len(data) if isinstance(data, pd.DataFrame) else len(data["order_ids"])
+
+def basket_items(data: BasketData) -> List:
+    return list(data.columns) if isinstance(data, pd.DataFrame) else list(data["items"])
+
+# Chuyển mỗi sản phẩm thành bitset: bit thứ i bật nếu giao dịch i chứa sản phẩm
+def build_item_bitsets(data: BasketData) -> Dict[int, int]:
+    item_bitsets: Dict[int, int] = {}
+    if isinstance(data, pd.DataFrame):
+        for column in data.columns:
+            packed: bytes = np.packbits(data[column].to_numpy() > 0, bitorder="little").tobytes()
+            item_bitsets[column] = int.from_bytes(packed, "little")
+        return item_bitsets
+
+    # Kho giao dịch: nhóm chỉ số giao dịch theo sản phẩm rồi bật bit tương ứng
+    n_transactions: int = count_transactions(data)
+    indptr: np.ndarray = data["indptr"]
+    indices: np.ndarray = data["indices"]
+    transaction_of_pair: np.ndarray = np.repeat(np.arange(n_transactions), np.diff(indptr))
+    order: np.ndarray = np.argsort(indices, kind="stable")
+    bounds: np.ndarray = np.concatenate([[0], np.cumsum(np.bincount(indices, minlength=len(data["items"])))])
+    present: np.ndarray = np.zeros(n_transactions, dtype=bool)
+    for index, item in enumerate(data["items"]):
+        tids: np.ndarray = transaction_of_pair[order[bounds[index]:bounds[index + 1]]]
+        present[tids] = True
+        item_bitsets[item] = int.from_bytes(np.packbits(present, bitorder="little").tobytes(), "little")
+        present[tids] = False
+    return item_bitsets
+
+# Sinh ứng viên mức k từ các tập phổ biến mức k-1 (đã sắp xếp): nối hai tập có chung k-2 phần tử đầu,
+# sau đó loại ứng viên có tập con (k-1) không phổ biến (tính chất Apriori)
+def generate_candidates(prev_itemsets: List[Tuple[int, ...]]) -> Tuple[List[Tuple[int, ...]], int, int]:
+    prev_set: Set[Tuple[int, ...]] = set(prev_itemsets)
+    candidates: List[Tuple[int, ...]] = []
+    n_generated: int = 0
+    n_pruned: int = 0
+
+    start: int = 0
+    while start < len(prev_itemsets):
+        # Gom nhóm các tập có cùng tiền tố k-2 phần tử
+        prefix: Tuple[int, ...] = prev_itemsets[start][:-1]
+        end: int = start
+        while end < len(prev_itemsets) and prev_itemsets[end][:-1] == prefix:
+            end += 1
+
+        for i in range(start, end):
+            for j in range(i + 1, end):
+                candidate: Tuple[int, ...] = prev_itemsets[i] + (prev_itemsets[j][-1],)
+                n_generated += 1
+                # Hai tập con bỏ phần tử cuối/áp cuối chính là hai tập cha, chỉ cần kiểm tra các tập con còn lại
+                if all(candidate[:m] + candidate[m + 1:] in prev_set for m in range(len(candidate) - 2)):
+                    candidates.append(candidate)
+                else:
+                    n_pruned += 1
+        start = end
+
+    return candidates, n_generated, n_pruned
 
 # Tạo hàm chạy thuật toán Apriori
-def generate_frequent_itemsets(matrix: pd.DataFrame, min_support: float) -> List[Tuple[FrozenSet[int], float]]:
-    item_support: Dict[FrozenSet[int], float] = {}
-    n_transactions: int = len(matrix)
+# level_stats (nếu truyền vào) nhận thống kê số ứng viên sinh ra / bị loại / phổ biến ở từng mức
+def generate_frequent_itemsets(matrix: BasketData, min_support: float,
+                               level_stats: Optional[List[Dict[str, int]]] = None) -> List[Tuple[FrozenSet[int], float]]:
+    n_transactions: int = count_transactions(matrix)
+    item_bitsets: Dict[int, int] = build_item_bitsets(matrix)
+    # Mã hóa item theo thứ tự cột để các tập luôn được lưu dưới dạng tuple đã sắp xếp
+    items: List[int] = list(item_bitsets.keys())
+    bitsets_by_index: List[int] = list(item_bitsets.values())
 
     # Tính support cho từng item
-    for column in matrix.columns:
-        support: float = matrix[column].sum() / n_transactions
+    level_bitsets: Dict[Tuple[int, ...], int] = {}
+    frequent_itemsets: List[Tuple[FrozenSet[int], float]] = []
+    for index, bits in enumerate(bitsets_by_index):
+        # Support = số bit 1 (popcount) / tổng số giao dịch
+        support: float = bits.bit_count() / n_transactions
         if support >= min_support:
-            item_support[frozenset([column])] = support
+            level_bitsets[(index,)] = bits
+            frequent_itemsets.append((frozenset([items[index]]), support))
+    if level_stats is not None:
+        level_stats.append({"k": 1, "generated": len(items), "pruned": 0, "frequent": len(level_bitsets)})
 
     # Tìm tập phổ biến lớn hơn
-    frequent_itemsets: List[Tuple[FrozenSet[int], float]] = []
     k: int = 2
-    current_itemsets: List[FrozenSet[int]] = list(item_support.keys())
-    while current_itemsets:
-        candidates: List[Tuple[int, ...]] = list(combinations(set().union(*current_itemsets), k))
-        candidate_support: Dict[FrozenSet[int], float] = {}
+    while level_bitsets:
+        candidates, n_generated, n_pruned = generate_candidates(list(level_bitsets.keys()))
+        candidate_bitsets: Dict[Tuple[int, ...], int] = {}
 
         for candidate in candidates:
-            candidate_set: FrozenSet[int] = frozenset(candidate)
-            support: float = matrix[list(candidate)].all(axis=1).sum() / n_transactions
+            # Bitset của ứng viên = bitset của tập cha (k-1) AND bitset của item cuối
+            bits: int = level_bitsets[candidate[:-1]] & bitsets_by_index[candidate[-1]]
+            support = bits.bit_count() / n_transactions
             if support >= min_support:
-                candidate_support[candidate_set] = support
+                candidate_bitsets[candidate] = bits
+                frequent_itemsets.append((frozenset(items[i] for i in candidate), support))
 
-        if not candidate_support:
-            break
+        if level_stats is not None:
+            level_stats.append({"k": k, "generated": n_generated, "pruned": n_pruned, "frequent": len(candidate_bitsets)})
 
-        item_support.update(candidate_support)
-        current_itemsets = list(candidate_support.keys())
-        frequent_itemsets.extend(candidate_support.items())
+        level_bitsets = candidate_bitsets
         k += 1
 
     return frequent_itemsets
 
-def generate_association_rules(frequent_itemsets: List[Tuple[FrozenSet[int], float]], min_confidence: float) -> List[Dict[str, Union[set, float]]]:
+# Tách dữ liệu giỏ hàng thành danh sách giao dịch, mỗi giao dịch là danh sách chỉ số sản phẩm
+def matrix_to_transactions(matrix: BasketData) -> List[List[int]]:
+    if not isinstance(matrix, pd.DataFrame):
+        indptr: np.ndarray = matrix["indptr"]
+        indices: List[int] = matrix["indices"].tolist()
+        return [indices[indptr[t]:indptr[t + 1]] for t in range(len(indptr) - 1)]
+    values: np.ndarray = matrix.to_numpy() > 0
+    return [np.flatnonzero(row).tolist() for row in values]
+
+# Xây FP-tree từ các giao dịch có trọng số (đường đi, số lần). Cây lưu dạng mảng song song:
+# node i có item[i], count[i], parent[i], children[i]; header ánh xạ item -> danh sách node của item đó
+def build_fp_tree(weighted_transactions: List[Tuple[List[int], int]], min_count: int) -> Dict[str, object]:
+    item_counts: Dict[int, int] = {}
+    for transaction, count in weighted_transactions:
+        for item in transaction:
+            item_counts[item] = item_counts.get(item, 0) + count
+
+    # Chỉ giữ item phổ biến, sắp xếp giảm dần theo support để các giao dịch chia sẻ tiền tố
+    frequent_counts: Dict[int, int] = {item: c for item, c in item_counts.items() if c >= min_count}
+    rank: Dict[int, Tuple[int, int]] = {item: (-c, item) for item, c in frequent_counts.items()}
+
+    tree: Dict[str, object] = {
+        "item": [-1], "count": [0], "parent": [-1], "children": [{}],
+        "header": {item: [] for item in frequent_counts}, "item_counts": frequent_counts,
+    }
+    items: List[int] = tree["item"]
+    counts: List[int] = tree["count"]
+    parents: List[int] = tree["parent"]
+    children: List[Dict[int, int]] = tree["children"]
+    header: Dict[int, List[int]] = tree["header"]
+
+    for transaction, count in weighted_transactions:
+        node: int = 0
+        for item in sorted((i for i in transaction if i in frequent_counts), key=rank.__getitem__):
+            child: Optional[int] = children[node].get(item)
+            if child is None:
+                child = len(items)
+                items.append(item)
+                counts.append(0)
+                parents.append(node)
+                children.append({})
+                children[node][item] = child
+                header[item].append(child)
+            counts[child] += count
+            node = child
+
+    return tree
+
+# Khai thác đệ quy FP-tree: với mỗi item trong bảng header, ghép vào hậu tố rồi khai thác cây điều kiện
+def mine_fp_tree(tree: Dict[str, object], suffix: Tuple[int, ...], min_count: int,
+                 results: List[Tuple[Tuple[int, ...], int]]) -> None:
+    items: List[int] = tree["item"]
+    counts: List[int] = tree["count"]
+    parents: List[int] = tree["parent"]
+    children: List[Dict[int, int]] = tree["children"]
+    item_counts: Dict[int, int] = tree["item_counts"]
+
+    # Cây chỉ có một nhánh: mọi tổ hợp các node trên nhánh đều phổ biến, support = count của node sâu nhất
+    if all(len(c) <= 1 for c in children):
+        path: List[int] = []
+        node: int = 0
+        while children[node]:
+            node = next(iter(children[node].values()))
+            path.append(node)
+        for size in range(1, len(path) + 1):
+            for combo in combinations(path, size):
+                results.append((suffix + tuple(items[n] for n in combo), counts[combo[-1]]))
+        return
+
+    # Duyệt item từ ít phổ biến nhất đến phổ biến nhất
+    for item in sorted(item_counts, key=lambda i: (item_counts[i], -i)):
+        new_suffix: Tuple[int, ...] = suffix + (item,)
+        results.append((new_suffix, item_counts[item]))
+
+        # Cơ sở mẫu điều kiện: đường đi từ gốc tới cha của mỗi node chứa item, kèm count của node
+        conditional_base: List[Tuple[List[int], int]] = []
+        for node in tree["header"][item]:
+            path = []
+            parent: int = parents[node]
+            while parent > 0:
+                path.append(items[parent])
+                parent = parents[parent]
+            if path:
+                conditional_base.append((path, counts[node]))
+
+        if conditional_base:
+            conditional_tree: Dict[str, object] = build_fp_tree(conditional_base, min_count)
+            if conditional_tree["item_counts"]:
+                mine_fp_tree(conditional_tree, new_suffix, min_count, results)
+
+# Khai thác tập phổ biến bằng FP-Growth, trả về cùng dạng với generate_frequent_itemsets
+def generate_frequent_itemsets_fpgrowth(matrix: BasketData, min_support: float) -> List[Tuple[FrozenSet[int], float]]:
+    n_transactions: int = count_transactions(matrix)
+    items: List = basket_items(matrix)
+    min_count: int = int(np.ceil(min_support * n_transactions - 1e-9))
+
+    tree: Dict[str, object] = build_fp_tree([(t, 1) for t in matrix_to_transactions(matrix)], min_count)
+    results: List[Tuple[Tuple[int, ...], int]] = []
+    mine_fp_tree(tree, (), min_count, results)
+
+    return [(frozenset(items[i] for i in itemset), count / n_transactions) for itemset, count in results]
+
+# Đếm support tuyệt đối của các tập (tuple mã sản phẩm) từ bitset của từng sản phẩm.
+# Duyệt các tập theo thứ tự từ điển và giữ ngăn xếp bitset của tiền tố để dùng lại phép AND của tiền tố chung
+def count_itemsets_with_bitsets(bitsets_by_index: List[int], itemsets: List[Tuple[int, ...]]) -> Dict[Tuple[int, ...], int]:
+    counts: Dict[Tuple[int, ...], int] = {}
+    stack: List[int] = []
+    previous: Tuple[int, ...] = ()
+    for itemset in sorted(itemsets):
+        common: int = 0
+        while common < min(len(previous), len(itemset)) and previous[common] == itemset[common]:
+            common += 1
+        del stack[common:]
+        for item in itemset[len(stack):]:
+            stack.append(bitsets_by_index[item] if not stack else stack[-1] & bitsets_by_index[item])
+        counts[itemset] = stack[-1].bit_count()
+        previous = itemset
+    return counts
+
+def count_itemsets(store: TransactionStore, itemsets: List[Tuple[int, ...]]) -> Dict[Tuple[int, ...], int]:
+    return count_itemsets_with_bitsets(list(build_item_bitsets(store).values()), itemsets)
+
+# Pha 1 của SON: khai thác tập phổ biến cục bộ trên một phân vùng, trả về tuple mã sản phẩm
+def mine_partition(store: TransactionStore, min_support: float) -> List[Tuple[int, ...]]:
+    codes: Dict = {item: index for index, item in enumerate(store["items"])}
+    return [tuple(sorted(codes[item] for item in itemset))
+            for itemset, _ in generate_frequent_itemsets(store, min_support)]
+
+# Khai thác song song theo thuật toán SON: chia giao dịch thành các phân vùng, khai thác cục bộ trên từng phân vùng
+# (tập phổ biến toàn cục luôn phổ biến cục bộ ở ít nhất một phân vùng), hợp các ứng viên rồi đếm lại support
+# chính xác trên mọi phân vùng. Kết quả trùng với generate_frequent_itemsets, kể cả thứ tự
+def generate_frequent_itemsets_son(matrix: BasketData, min_support: float, n_workers: Optional[int] = None,
+                                   n_partitions: Optional[int] = None) -> List[Tuple[FrozenSet[int], float]]:
+    store: TransactionStore = matrix_to_store(matrix)
+    n_transactions: int = count_transactions(store)
+    n_workers = n_workers or os.cpu_count() or 1
+    n_partitions = max(1, min(n_partitions or n_workers, n_transactions))
+    bounds: List[int] = [round(p * n_transactions / n_partitions) for p in range(n_partitions + 1)]
+    partitions: List[TransactionStore] = [slice_transaction_store(store, bounds[p], bounds[p + 1]) for p in range(n_partitions)]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # Pha 1: hợp các tập phổ biến cục bộ thành tập ứng viên
+        candidates: Set[Tuple[int, ...]] = set()
+        for local_itemsets in executor.map(mine_partition, partitions, [min_support] * n_partitions):
+            candidates.update(local_itemsets)
+
+        # Pha 2: cộng support của các ứng viên trên tất cả phân vùng
+        candidate_list: List[Tuple[int, ...]] = list(candidates)
+        total_counts: Dict[Tuple[int, ...], int] = dict.fromkeys(candidate_list, 0)
+        for counts in executor.map(count_itemsets, partitions, [candidate_list] * n_partitions):
+            for itemset, count in counts.items():
+                total_counts[itemset] += count
+
+    items: List = store["items"]
+    frequent: List[Tuple[int, ...]] = sorted((itemset for itemset, count in total_counts.items()
+                                              if count / n_transactions >= min_support), key=lambda t: (len(t), t))
+    return [(frozenset(items[i] for i in itemset), total_counts[itemset] / n_transactions) for itemset in frequent]
+
+# Trạng thái khai thác tăng dần (kiểu FUP): các order_id đã nạp, số dòng của file lịch sử đã đọc ("rows_read"),
+# bitset toàn lịch sử của từng sản phẩm và support tuyệt đối của mọi tập phổ biến
+# (tuple mã sản phẩm theo bảng mã chung "items")
+IncrementalState = Dict[str, object]
+
+def create_incremental_state(min_support: float) -> IncrementalState:
+    return {
+        "min_support": min_support,
+        "n_transactions": 0,
+        "items": [],
+        "item_codes": {},
+        "item_bitsets": [],
+        "seen_orders": set(),
+        "rows_read": 0,
+        "counts": {},
+    }
+
+# Cập nhật trạng thái với các đơn hàng mới. Tập phổ biến cũ chỉ cần đếm thêm trên phần dữ liệu mới;
+# tập chưa từng phổ biến chỉ có thể trở thành phổ biến nếu phổ biến trong phần mới, nên chỉ những tập đó
+# mới phải đếm lại trên toàn bộ lịch sử. Đơn hàng trùng order_id với đơn đã nạp bị bỏ qua
+def update_incremental_state(state: IncrementalState, new_data: BasketData) -> IncrementalState:
+    delta: TransactionStore = matrix_to_store(new_data)
+    keep: List[int] = [t for t, order_id in enumerate(delta["order_ids"]) if order_id not in state["seen_orders"]]
+    if len(keep) < count_transactions(delta):
+        indptr: np.ndarray = delta["indptr"]
+        delta = {
+            "order_ids": [delta["order_ids"][t] for t in keep],
+            "items": delta["items"],
+            "indptr": np.concatenate([[0], np.cumsum(np.diff(indptr)[keep])]).astype(np.int64),
+            "indices": np.concatenate([delta["indices"][indptr[t]:indptr[t + 1]] for t in keep] or [np.zeros(0, dtype=np.int32)]),
+            "stats": delta["stats"],
+        }
+    n_delta: int = count_transactions(delta)
+    if n_delta == 0:
+        return state
+
+    # Chuyển mã sản phẩm của phần mới sang bảng mã chung, sản phẩm mới được thêm vào cuối bảng
+    items: List = state["items"]
+    item_codes: Dict = state["item_codes"]
+    for item in delta["items"]:
+        if item not in item_codes:
+            item_codes[item] = len(items)
+            items.append(item)
+            state["item_bitsets"].append(0)
+    remap: np.ndarray = np.array([item_codes[item] for item in delta["items"]], dtype=np.int32)
+    delta = {**delta, "items": list(items), "indices": remap[delta["indices"]]}
+
+    # Nối bitset của phần mới vào sau bitset lịch sử (chỉ các sản phẩm xuất hiện trong phần mới thay đổi).
+    # Phép dịch và OR tạo lại cả bitset của sản phẩm, nên bước này (và việc đếm lại ứng viên mới được đẩy lên)
+    # tỉ lệ với độ dài lịch sử chứ không chỉ với phần mới
+    min_support: float = state["min_support"]
+    n_old: int = state["n_transactions"]
+    n_total: int = n_old + n_delta
+    delta_bitsets: List[int] = list(build_item_bitsets(delta).values())
+    item_bitsets: List[int] = state["item_bitsets"]
+    for code in np.unique(delta["indices"]).tolist():
+        item_bitsets[code] |= delta_bitsets[code] << n_old
+
+    old_counts: Dict[Tuple[int, ...], int] = state["counts"]
+    new_counts: Dict[Tuple[int, ...], int] = {}
+    candidates: List[Tuple[int, ...]] = [(code,) for code in range(len(items))]
+    while candidates:
+        delta_counts: Dict[Tuple[int, ...], int] = count_itemsets_with_bitsets(delta_bitsets, candidates)
+        level: Dict[Tuple[int, ...], int] = {}
+        promoted: List[Tuple[int, ...]] = []
+        for candidate in candidates:
+            if candidate in old_counts:
+                level[candidate] = old_counts[candidate] + delta_counts[candidate]
+            elif delta_counts[candidate] / n_delta >= min_support:
+                promoted.append(candidate)
+        # Chỉ các ứng viên mới được đẩy lên mới phải quét lại dữ liệu cũ
+        level.update(count_itemsets_with_bitsets(item_bitsets, promoted))
+
+        frequent: List[Tuple[int, ...]] = sorted(c for c, count in level.items() if count / n_total >= min_support)
+        new_counts.update((c, level[c]) for c in frequent)
+        candidates = generate_candidates(frequent)[0]
+
+    state["counts"] = new_counts
+    state["n_transactions"] = n_total
+    state["seen_orders"].update(delta["order_ids"])
+    return state
+
+# Danh sách tập phổ biến hiện tại của trạng thái tăng dần, cùng dạng với generate_frequent_itemsets
+def incremental_frequent_itemsets(state: IncrementalState) -> List[Tuple[FrozenSet[int], float]]:
+    items: List = state["items"]
+    return [(frozenset(items[i] for i in itemset), state["counts"][itemset] / state["n_transactions"])
+            for itemset in sorted(state["counts"], key=lambda t: (len(t), t))]
+
+# Ghi lại toàn bộ trạng thái, kể cả bitset toàn lịch sử: chi phí ghi tỉ lệ với độ dài lịch sử
+def save_incremental_state(state: IncrementalState, path: str) -> None:
+    with open(path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_incremental_state(path: str) -> IncrementalState:
+    with open(path, "rb") as f:
+        state: IncrementalState = pickle.load(f)
+    # File lưu bởi phiên bản cũ còn giữ bản sao các phân đoạn giao dịch; lịch sử đã nằm trong item_bitsets
+    state.pop("segments", None)
+    # Trạng thái cũ chưa lưu số dòng đã đọc: đọc lại cả file, các order_id đã nạp vẫn được bỏ qua
+    state.setdefault("rows_read", 0)
+    return state
+
+# Cập nhật hằng ngày: nạp trạng thái đã lưu (hoặc tạo mới), chỉ đọc các dòng được nối thêm vào file lịch sử
+# từ lần trước (file phải chỉ được ghi nối thêm), cập nhật rồi lưu lại. Với Excel, openpyxl vẫn phải quét qua
+# các dòng bị bỏ qua (không tạo DataFrame); delta_file=True nhận file chỉ chứa các đơn hàng mới của ngày,
+# khi đó số dòng đã đọc của file lịch sử không đổi
+def run_incremental_update(state_path: str, file_path: str, min_support: float,
+                           delta_file: bool = False) -> List[Tuple[FrozenSet[int], float]]:
+    state: IncrementalState = (load_incremental_state(state_path) if os.path.exists(state_path)
+                               else create_incremental_state(min_support))
+    if state["min_support"] != min_support:
+        raise ValueError(f"Trạng thái đã lưu dùng min_supp = {state['min_support']}, không thể cập nhật với {min_support}.")
+    if delta_file:
+        update_incremental_state(state, build_transaction_store(file_path))
+    else:
+        delta: TransactionStore = build_transaction_store(file_path, skip_rows=state["rows_read"])
+        update_incremental_state(state, delta)
+        state["rows_read"] += delta["stats"]["n_rows"]
+    save_incremental_state(state, state_path)
+    return incremental_frequent_itemsets(state)
+
+# Liệt kê tập đóng phổ biến theo kiểu LCM trên bitset: mỗi tập đóng P chỉ được mở rộng bằng item e lớn hơn item
+# sinh ra nó, lấy bao đóng Q = closure(P + e) và chỉ nhận Q nếu phần nhỏ hơn e của Q trùng với của P,
+# nhờ vậy mỗi tập đóng được sinh đúng một lần và không phải duyệt các tập con dư thừa.
+# maximal=True chỉ giữ các tập đóng không còn item nào thêm vào mà vẫn phổ biến (tập tối đại)
+def mine_closed_bitsets(bitsets_by_index: List[int], n_transactions: int, min_count: int,
+                        maximal: bool = False) -> List[Tuple[Tuple[int, ...], int]]:
+    frequent_items: List[int] = [i for i, bits in enumerate(bitsets_by_index) if bits.bit_count() >= min_count]
+    results: List[Tuple[Tuple[int, ...], int]] = []
+
+    def closure(tids: int) -> Tuple[int, ...]:
+        return tuple(i for i in frequent_items if bitsets_by_index[i] & tids == tids)
+
+    def is_maximal(itemset: Set[int], tids: int) -> bool:
+        return all((tids & bitsets_by_index[i]).bit_count() < min_count for i in frequent_items if i not in itemset)
+
+    def expand(itemset: Tuple[int, ...], tids: int, core: int) -> None:
+        itemset_set: Set[int] = set(itemset)
+        for e in frequent_items:
+            if e <= core or e in itemset_set:
+                continue
+            new_tids: int = tids & bitsets_by_index[e]
+            count: int = new_tids.bit_count()
+            if count < min_count:
+                continue
+            new_itemset: Tuple[int, ...] = closure(new_tids)
+            if any(i < e and i not in itemset_set for i in new_itemset):
+                continue
+            if not maximal or is_maximal(set(new_itemset), new_tids):
+                results.append((new_itemset, count))
+            expand(new_itemset, new_tids, e)
+
+    if n_transactions >= min_count > 0:
+        all_tids: int = (1 << n_transactions) - 1
+        root: Tuple[int, ...] = closure(all_tids)
+        if root and (not maximal or is_maximal(set(root), all_tids)):
+            results.append((root, n_transactions))
+        expand(root, all_tids, -1)
+    return results
+
+def mine_closed_itemsets(matrix: BasketData, min_support: float, maximal: bool) -> List[Tuple[FrozenSet[int], float]]:
+    n_transactions: int = count_transactions(matrix)
+    item_bitsets: Dict[int, int] = build_item_bitsets(matrix)
+    items: List = list(item_bitsets.keys())
+    min_count: int = max(1, int(np.ceil(min_support * n_transactions - 1e-9)))
+    results = mine_closed_bitsets(list(item_bitsets.values()), n_transactions, min_count, maximal)
+    return [(frozenset(items[i] for i in itemset), count / n_transactions)
+            for itemset, count in sorted(results, key=lambda r: (len(r[0]), r[0]))]
+
+# Chỉ trả về các tập đóng phổ biến (không có tập cha nào cùng support), cùng dạng với generate_frequent_itemsets
+def generate_closed_itemsets(matrix: BasketData, min_support: float) -> List[Tuple[FrozenSet[int], float]]:
+    return mine_closed_itemsets(matrix, min_support, maximal=False)
+
+# Chỉ trả về các tập phổ biến tối đại (không có tập cha nào phổ biến); support của các tập con không suy ra được
+def generate_maximal_itemsets(matrix: BasketData, min_support: float) -> List[Tuple[FrozenSet[int], float]]:
+    return mine_closed_itemsets(matrix, min_support, maximal=True)
+
+# Chỉ mục ngược item -> các tập đóng chứa item, để tra support của một tập phổ biến bất kỳ
+def build_closed_index(closed_itemsets: List[Tuple[FrozenSet[int], float]]) -> Dict[str, object]:
+    item_index: Dict[int, Set[int]] = {}
+    for position, (itemset, _) in enumerate(closed_itemsets):
+        for item in itemset:
+            item_index.setdefault(item, set()).add(position)
+    return {"supports": [support for _, support in closed_itemsets], "item_index": item_index}
+
+# Support của X = support lớn nhất trong các tập đóng chứa X; None nếu X không phổ biến
+def closed_support(closed_index: Dict[str, object], itemset: FrozenSet[int]) -> Optional[float]:
+    supports: List[float] = closed_index["supports"]
+    item_index: Dict[int, Set[int]] = closed_index["item_index"]
+    if not itemset:
+        return 1.0
+    if any(item not in item_index for item in itemset):
+        return None
+    positions: Set[int] = set.intersection(*sorted((item_index[item] for item in itemset), key=len))
+    return max((supports[p] for p in positions), default=None)
+
+# Các thuật toán khai thác tập phổ biến có thể chọn
+MINING_METHODS: Dict[str, Callable[[BasketData, float], List[Tuple[FrozenSet[int], float]]]] = {
+    "Apriori": generate_frequent_itemsets,
+    "FP-Growth": generate_frequent_itemsets_fpgrowth,
+    "SON (song song)": generate_frequent_itemsets_son,
+    "Tập đóng (Closed)": generate_closed_itemsets,
+}
+
+def mine_frequent_itemsets(matrix: BasketData, min_support: float, method: str = "Apriori") -> List[Tuple[FrozenSet[int], float]]:
+    if method not in MINING_METHODS:
+        raise ValueError(f"Thuật toán không hợp lệ: {method}. Chọn một trong {', '.join(MINING_METHODS)}.")
+    return MINING_METHODS[method](matrix, min_support)
+
+# Sinh luật kết hợp theo kiểu ap-genrules: với mỗi tập phổ biến, mở rộng dần vế phải từ các vế phải
+# đã thỏa min_confidence (confidence giảm khi chuyển item từ vế trái sang vế phải nên vế phải không đạt thì bỏ cả nhánh).
+# Support của vế trái/vế phải được tra trong bảng băm, lift/leverage/conviction tính luôn trong cùng lượt.
+# support_lookup: hàm tra support thay cho bảng băm, ví dụ khi frequent_itemsets chỉ gồm các tập đóng
+def generate_association_rules(frequent_itemsets: List[Tuple[FrozenSet[int], float]], min_confidence: float,
+                               support_lookup: Optional[Callable[[FrozenSet[int]], Optional[float]]] = None) -> List[Dict[str, Union[set, float]]]:
+    if support_lookup is None:
+        support_lookup = dict(frequent_itemsets).get
     rules: List[Dict[str, Union[set, float]]] = []
     for itemset, support in frequent_itemsets:
         if len(itemset) < 2:
             continue
 
-        for consequence in itemset:
-            antecedent: FrozenSet[int] = itemset - frozenset([consequence])
-            antecedent_support: Optional[float] = next((s for i, s in frequent_itemsets if i == antecedent), None)
-            if antecedent_support is None:
-                continue
+        # Vế phải được biểu diễn bằng tuple chỉ số (đã sắp xếp) trong itemset để dùng lại generate_candidates
+        ordered: List[int] = sorted(itemset, key=str)
+        consequents: List[Tuple[int, ...]] = [(i,) for i in range(len(ordered))]
+        while consequents:
+            confident: List[Tuple[int, ...]] = []
+            for positions in consequents:
+                consequence: FrozenSet[int] = frozenset(ordered[i] for i in positions)
+                antecedent: FrozenSet[int] = itemset - consequence
+                antecedent_support: Optional[float] = support_lookup(antecedent)
+                consequence_support: Optional[float] = support_lookup(consequence)
+                if antecedent_support is None or consequence_support is None:
+                    continue
 
-            confidence: float = support / antecedent_support
-            if confidence >= min_confidence:
+                confidence: float = support / antecedent_support
+                if confidence < min_confidence:
+                    continue
+                confident.append(positions)
                 rules.append({
                     "antecedent": set(antecedent),
-                    "consequence": set([consequence]),
+                    "consequence": set(consequence),
                     "support": support,
-                    "confidence": confidence
+                    "confidence": confidence,
+                    "lift": confidence / consequence_support,
+                    "leverage": support - antecedent_support * consequence_support,
+                    "conviction": (1 - consequence_support) / (1 - confidence) if confidence < 1 else float("inf")
                 })
 
+            # Vế trái phải còn ít nhất một item
+            if not confident or len(confident[0]) + 1 >= len(ordered):
+                break
+            consequents = generate_candidates(confident)[0]
+
     return rules
 
+# Chỉ mục luật kết hợp dùng để gợi ý: luật r có vế trái antecedent_indices[antecedent_indptr[r]:antecedent_indptr[r + 1]]
+# (mã sản phẩm), vế phải tương tự; chỉ mục ngược posting_rules[posting_indptr[i]:posting_indptr[i + 1]] là các luật
+# có sản phẩm i ở vế trái
+RuleIndex = Dict[str, object]
+
+# Chuyển danh sách các tập mã thành mảng dạng CSR (indptr, indices)
+def to_csr(rows: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    indptr: np.ndarray = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices: np.ndarray = np.fromiter((i for row in rows for i in row), dtype=np.int64, count=int(indptr[-1]))
+    return indptr, indices
+
+# Với mỗi khóa keys[j], liệt kê các vị trí indptr[keys[j]]..indptr[keys[j] + 1] - 1; trả về (j, vị trí)
+def expand_ranges(indptr: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lengths: np.ndarray = indptr[keys + 1] - indptr[keys]
+    owners: np.ndarray = np.repeat(np.arange(len(keys)), lengths)
+    offsets: np.ndarray = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owners, indptr[keys][owners] + offsets
+
+def build_rule_index(rules: List[Dict[str, Union[set, float]]]) -> RuleIndex:
+    item_codes: Dict = {}
+    items: List = []
+    for rule in rules:
+        for item in list(rule["antecedent"]) + list(rule["consequence"]):
+            if item not in item_codes:
+                item_codes[item] = len(items)
+                items.append(item)
+
+    antecedent_indptr, antecedent_indices = to_csr([[item_codes[i] for i in rule["antecedent"]] for rule in rules])
+    consequent_indptr, consequent_indices = to_csr([[item_codes[i] for i in rule["consequence"]] for rule in rules])
+    # Chỉ mục ngược: sắp xếp các cặp (sản phẩm, luật) theo sản phẩm
+    rule_of_pair: np.ndarray = np.repeat(np.arange(len(rules)), np.diff(antecedent_indptr))
+    order: np.ndarray = np.argsort(antecedent_indices, kind="stable")
+    posting_indptr: np.ndarray = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(antecedent_indices, minlength=len(items)), out=posting_indptr[1:])
+
+    return {
+        "items": items,
+        "item_codes": item_codes,
+        "antecedent_indptr": antecedent_indptr,
+        "antecedent_indices": antecedent_indices,
+        "antecedent_len": np.diff(antecedent_indptr),
+        "consequent_indptr": consequent_indptr,
+        "consequent_indices": consequent_indices,
+        "posting_indptr": posting_indptr,
+        "posting_rules": rule_of_pair[order],
+        "metrics": {metric: np.array([rule[metric] for rule in rules], dtype=float)
+                    for metric in ("support", "confidence", "lift")},
+    }
+
+# Các mảng CSR của chỉ mục được lưu thẳng vào file nhị phân .npz
+RULE_INDEX_ARRAYS: Tuple[str, ...] = ("antecedent_indptr", "antecedent_indices", "antecedent_len", "consequent_indptr",
+                                      "consequent_indices", "posting_indptr", "posting_rules")
+
+# Lưu chỉ mục dạng .npz giống định dạng mô hình của Clustering_Common: các mảng NumPy, metric lưu thành mảng
+# "metric_<tên>", danh sách sản phẩm là chuỗi JSON; khi đọc lại không cần pickle (allow_pickle=False), nên nạp
+# được file do tác vụ hằng đêm sinh ra mà không phải chạy mã tùy ý trong file
+def save_rule_index(index: RuleIndex, path: str) -> None:
+    metrics: Dict[str, np.ndarray] = {f"metric_{metric}": values for metric, values in index["metrics"].items()}
+    np.savez(path, items=np.array(json.dumps(index["items"], default=str)),
+             **{name: index[name] for name in RULE_INDEX_ARRAYS}, **metrics)
+
+def load_rule_index(path: str) -> RuleIndex:
+    with np.load(path, allow_pickle=False) as archive:
+        items: List = json.loads(str(archive["items"]))
+        index: RuleIndex = {name: archive[name] for name in RULE_INDEX_ARRAYS}
+        index["metrics"] = {name[len("metric_"):]: archive[name] for name in archive.files if name.startswith("metric_")}
+    index["items"] = items
+    index["item_codes"] = {item: code for code, item in enumerate(items)}
+    return index
+
+# Gợi ý theo lô: với mỗi giỏ hàng, tìm các luật có vế trái nằm trong giỏ (đếm số item vế trái khớp qua chỉ mục ngược),
+# chấm điểm các sản phẩm ở vế phải chưa có trong giỏ bằng metric lớn nhất của luật gợi ý ra nó, rồi lấy top_n.
+# Toàn bộ lô được xử lý bằng các phép NumPy trên mảng cặp (giỏ, luật) / (giỏ, sản phẩm)
+def recommend(index: RuleIndex, baskets: List[List], top_n: int = 5, metric: str = "confidence") -> List[List[Tuple[object, float]]]:
+    if metric not in index["metrics"]:
+        raise ValueError(f"Metric không hợp lệ: {metric}. Chọn một trong {', '.join(index['metrics'])}.")
+    item_codes: Dict = index["item_codes"]
+    n_items: int = max(len(index["items"]), 1)
+    n_rules: int = max(len(index["antecedent_len"]), 1)
+    basket_indptr, basket_items = to_csr([sorted({item_codes[i] for i in basket if i in item_codes}) for basket in baskets])
+    basket_of_item: np.ndarray = np.repeat(np.arange(len(baskets)), np.diff(basket_indptr))
+
+    # Cặp (giỏ, luật) cho mỗi item của giỏ nằm ở vế trái luật; luật được kích hoạt khi đủ số item vế trái
+    owners, positions = expand_ranges(index["posting_indptr"], basket_items)
+    keys, matched = np.unique(basket_of_item[owners] * n_rules + index["posting_rules"][positions], return_counts=True)
+    fired_rules: np.ndarray = keys % n_rules
+    fired: np.ndarray = matched == index["antecedent_len"][fired_rules]
+    fired_baskets: np.ndarray = (keys // n_rules)[fired]
+    fired_rules = fired_rules[fired]
+
+    # Cặp (giỏ, sản phẩm vế phải) kèm điểm, bỏ sản phẩm đã có trong giỏ
+    owners, positions = expand_ranges(index["consequent_indptr"], fired_rules)
+    pair_keys: np.ndarray = fired_baskets[owners] * n_items + index["consequent_indices"][positions]
+    scores: np.ndarray = index["metrics"][metric][fired_rules][owners]
+    new_item: np.ndarray = ~np.isin(pair_keys, basket_of_item * n_items + basket_items)
+    pair_keys, scores = pair_keys[new_item], scores[new_item]
+
+    # Giữ điểm lớn nhất cho mỗi (giỏ, sản phẩm), rồi xếp hạng trong từng giỏ
+    order: np.ndarray = np.lexsort((-scores, pair_keys))
+    pair_keys, scores = pair_keys[order], scores[order]
+    first: np.ndarray = np.ones(len(pair_keys), dtype=bool)
+    first[1:] = pair_keys[1:] != pair_keys[:-1]
+    pair_keys, scores = pair_keys[first], scores[first]
+    pair_baskets: np.ndarray = pair_keys // n_items
+    order = np.lexsort((-scores, pair_baskets))
+    pair_keys, scores, pair_baskets = pair_keys[order], scores[order], pair_baskets[order]
+    group_start: np.ndarray = np.searchsorted(pair_baskets, pair_baskets, side="left")
+    keep: np.ndarray = np.arange(len(pair_keys)) - group_start < top_n
+
+    items: List = index["items"]
+    recommendations: List[List[Tuple[object, float]]] = [[] for _ in baskets]
+    for basket, key, score in zip(pair_baskets[keep].tolist(), pair_keys[keep].tolist(), scores[keep].tolist()):
+        recommendations[basket].append((items[key % n_items], score))
+    return recommendations
+
 def upload_file() -> None:
     global file_path
-    file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx")])
+    file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
     if file_path:
         label_file_path.config(text=f"Đã chọn: {file_path}")
     else:
@@ -73,27 +809,36 @@ def upload_file() -> None:
 def run_apriori() -> None:
     try:
         if not file_path:
-            raise ValueError("Vui lòng tải lên file Excel.")
+            raise ValueError("Vui lòng tải lên file dữ liệu.")
         
-        df: pd.DataFrame = pd.read_excel(file_path)
-        if 'order_id' not in df.columns or 'product_id' not in df.columns:
-            raise ValueError("File Excel phải chứa các cột 'order_id' và 'product_id'.")
-
-        matrix: pd.DataFrame = df.groupby(['order_id', 'product_id']).size().unstack(fill_value=0)
-        matrix = (matrix > 0).astype(int)
-        print("Basket DataFrame:")
-        print(matrix.head())  # Kiểm tra dữ liệu
+        matrix: TransactionStore = build_transaction_store(file_path)
+        print("Transaction store:")
+        print(f"{len(matrix['order_ids'])} đơn hàng, {len(matrix['items'])} sản phẩm, "
+              f"{matrix['stats']['n_pairs']} cặp")  # Kiểm tra dữ liệu
 
         min_supp: float = float(entry_min_supp.get())
         min_conf: float = float(entry_min_conf.get())
         if not (0 < min_supp <= 1) or not (0 < min_conf <= 1):
             raise ValueError("min_supp và min_conf phải nằm trong khoảng (0, 1].")
         
-        frequent_itemsets: List[Tuple[FrozenSet[int], float]] = generate_frequent_itemsets(matrix, min_supp)
+        method: str = mining_method.get()
+        if method == "Apriori":
+            level_stats: List[Dict[str, int]] = []
+            frequent_itemsets: List[Tuple[FrozenSet[int], float]] = generate_frequent_itemsets(matrix, min_supp, level_stats)
+            print("Candidate stats:")
+            for stats in level_stats:
+                print(f"k={stats['k']}: sinh {stats['generated']}, loại {stats['pruned']}, phổ biến {stats['frequent']}")
+        else:
+            frequent_itemsets = mine_frequent_itemsets(matrix, min_supp, method)
         print("Frequent Itemsets:")
         print(frequent_itemsets)  # Kiểm tra đầu ra
 
-        rules: List[Dict[str, Union[set, float]]] = generate_association_rules(frequent_itemsets, min_conf)
+        # Với tập đóng, support của vế trái/vế phải được suy ra từ các tập đóng chứa chúng
+        support_lookup: Optional[Callable[[FrozenSet[int]], Optional[float]]] = None
+        if method == "Tập đóng (Closed)":
+            closed_index: Dict[str, object] = build_closed_index(frequent_itemsets)
+            support_lookup = lambda itemset: closed_support(closed_index, itemset)
+        rules: List[Dict[str, Union[set, float]]] = generate_association_rules(frequent_itemsets, min_conf, support_lookup)
         print("Association Rules:")
         print(rules)  # Kiểm tra đầu ra
 
@@ -104,48 +849,58 @@ def run_apriori() -> None:
             output_window.title("Kết quả")
             text: tk.Text = tk.Text(output_window, wrap=tk.WORD, height=30, width=80, bg="#1C2833", fg="white")
             text.pack()
+            text.insert(tk.END, f"Dữ liệu: {len(matrix['order_ids'])} đơn hàng, {len(matrix['items'])} sản phẩm\n\n")
             for rule in rules:
                 text.insert(tk.END, f"{rule['antecedent']} => {rule['consequence']}\n")
-                text.insert(tk.END, f"Support: {rule['support']}, Confidence: {rule['confidence']}\n\n")
+                text.insert(tk.END, f"Support: {rule['support']}, Confidence: {rule['confidence']}\n")
+                text.insert(tk.END, f"Lift: {rule['lift']}, Leverage: {rule['leverage']}, Conviction: {rule['conviction']}\n\n")
     except Exception as e:
         messagebox.showerror("Lỗi", f"Đã xảy ra lỗi: {str(e)}")
 
-# Tạo giao diện Tkinter
-root: tk.Tk = tk.Tk()
-root.title("Thuật toán Apriori")
-root.geometry("500x400")
-root.configure(bg="#1C2833")
+if __name__ == "__main__":
+    # Tạo giao diện Tkinter
+    root: tk.Tk = tk.Tk()
+    root.title("Thuật toán Apriori")
+    root.geometry("500x480")
+    root.configure(bg="#1C2833")
 
-file_path: str = ""
+    file_path: str = ""
 
-# Tiêu đề
-title_label = tk.Label(root, text="THUẬT TOÁN APRIORI", font=("Cambria", 18, "bold"), bg="#1C2833", fg="white")
-title_label.pack(pady=10)
+    # Tiêu đề
+    title_label = tk.Label(root, text="THUẬT TOÁN APRIORI", font=("Cambria", 18, "bold"), bg="#1C2833", fg="white")
+    title_label.pack(pady=10)
 
-# Nút tải file
-button_upload = tk.Button(root, text="Tải file Excel", command=upload_file, bg="#2E4053", fg="white", font=("Cambria", 12))
-button_upload.pack(pady=5)
+    # Nút tải file
+    button_upload = tk.Button(root, text="Tải file dữ liệu", command=upload_file, bg="#2E4053", fg="white", font=("Cambria", 12))
+    button_upload.pack(pady=5)
 
-# Đường dẫn file
-label_file_path = tk.Label(root, text="Chưa chọn file.", bg="#1C2833", fg="white", font=("Cambria", 10))
-label_file_path.pack(pady=5)
+    # Đường dẫn file
+    label_file_path = tk.Label(root, text="Chưa chọn file.", bg="#1C2833", fg="white", font=("Cambria", 10))
+    label_file_path.pack(pady=5)
 
-# Min Support Input
-label_min_supp = tk.Label(root, text="Ngưỡng min_supp:", bg="#1C2833", fg="white", font=("Cambria", 12))
-label_min_supp.pack(pady=5)
-entry_min_supp = tk.Entry(root, font=("Cambria", 12), bg="#2E4053", fg="white", justify="center")
-entry_min_supp.pack()
+    # Min Support Input
+    label_min_supp = tk.Label(root, text="Ngưỡng min_supp:", bg="#1C2833", fg="white", font=("Cambria", 12))
+    label_min_supp.pack(pady=5)
+    entry_min_supp = tk.Entry(root, font=("Cambria", 12), bg="#2E4053", fg="white", justify="center")
+    entry_min_supp.pack()
 
-# Min Confidence Input
-label_min_conf = tk.Label(root, text="Ngưỡng min_conf:", bg="#1C2833", fg="white", font=("Cambria", 12))
-label_min_conf.pack(pady=5)
-entry_min_conf = tk.Entry(root, font=("Cambria", 12), bg="#2E4053", fg="white", justify="center")
-entry_min_conf.pack()
+    # Min Confidence Input
+    label_min_conf = tk.Label(root, text="Ngưỡng min_conf:", bg="#1C2833", fg="white", font=("Cambria", 12))
+    label_min_conf.pack(pady=5)
+    entry_min_conf = tk.Entry(root, font=("Cambria", 12), bg="#2E4053", fg="white", justify="center")
+    entry_min_conf.pack()
 
-# Nút chạy thuật toán
-button_run = tk.Button(root, text="Chạy thuật toán", command=run_apriori, bg="#2E4053", fg="white", font=("Cambria", 12, "bold"))
-button_run.pack(pady=20)
+    # Chọn thuật toán khai thác tập phổ biến
+    label_method = tk.Label(root, text="Thuật toán:", bg="#1C2833", fg="white", font=("Cambria", 12))
+    label_method.pack(pady=5)
+    mining_method = tk.StringVar(root, value="Apriori")
+    option_method = tk.OptionMenu(root, mining_method, *MINING_METHODS.keys())
+    option_method.config(bg="#2E4053", fg="white", font=("Cambria", 12))
+    option_method.pack()
 
-# Chạy ứng dụng
-root.mainloop()
+    # Nút chạy thuật toán
+    button_run = tk.Button(root, text="Chạy thuật toán", command=run_apriori, bg="#2E4053", fg="white", font=("Cambria", 12, "bold"))
+    button_run.pack(pady=20)
 
+    # Chạy ứng dụng
+    root.mainloop()
@@ -0,0 +1,110 @@
+import json
+import time
+import numpy as np
+import tkinter as tk
+
+# Phần dùng chung của k-means.py và Konohen.py: bộ ghi tiến trình và mô hình phân cụm đã huấn luyện
+# (lưu / nạp file .npz, gán cụm cho dữ liệu mới theo khối)
+
+# Số mẫu tối đa được liệt kê theo tên trong kết quả cuối; dữ liệu lớn hơn chỉ hiển thị số mẫu của mỗi cụm / neuron
+MAX_LISTED_SAMPLES = 1000
+# Số phần tử tối đa của ma trận khoảng cách mẫu x trọng tâm / neuron tính trong một khối (khoảng 32 MB với float64)
+MAX_SCORE_CELLS = 1 << 22
+
+def create_reporter(text_box, verbosity: int = 1, dump_path: str = None):
+    """
+    Bộ ghi tiến trình. verbosity: 0 = chỉ kết quả cuối, 1 = thêm tóm tắt từng vòng / epoch (sai số, kích thước cụm,
+    độ dịch chuyển trọng số, thời gian), 2 = thêm ghi ma trận đầy đủ ra file dump_path (không đưa vào text box).
+    """
+    return {
+        "text_box": text_box,
+        "verbosity": verbosity,
+        "dump_file": open(dump_path, "w", encoding="utf-8") if dump_path and verbosity >= 2 else None,
+        "start": time.perf_counter(),
+    }
+
+def report(reporter, message: str, level: int = 1):
+    if reporter["verbosity"] >= level:
+        reporter["text_box"].insert(tk.END, message + "\n")
+
+def dump(reporter, title: str, values: np.ndarray):
+    if reporter["dump_file"] is not None:
+        reporter["dump_file"].write(f"{title}\n")
+        np.savetxt(reporter["dump_file"], np.atleast_2d(values) if np.ndim(values) > 1 else np.reshape(values, (-1, 1)),
+                   fmt="%.6g")
+
+def close_reporter(reporter):
+    if reporter["dump_file"] is not None:
+        reporter["dump_file"].close()
+
+def feature_statistics(data: np.ndarray, chunk_size: int = 65536):
+    """
+    Trung bình và độ lệch chuẩn của từng thuộc tính, tính theo khối (dùng được với memmap).
+    Thuộc tính hằng có độ lệch chuẩn 0 được gán thang đo 1 để tránh chia cho 0.
+    """
+    n_samples, n_attrs = data.shape
+    total = np.zeros(n_attrs)
+    for start in range(0, n_samples, chunk_size):
+        total += np.asarray(data[start:start + chunk_size], dtype=float).sum(axis=0)
+    mean = total / n_samples
+    squared = np.zeros(n_attrs)
+    for start in range(0, n_samples, chunk_size):
+        squared += ((np.asarray(data[start:start + chunk_size], dtype=float) - mean) ** 2).sum(axis=0)
+    scale = np.sqrt(squared / n_samples)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+def create_model(weights: np.ndarray, feature_mean: np.ndarray = None, feature_scale: np.ndarray = None, **metadata):
+    """
+    Mô hình đã huấn luyện: vector trọng tâm k-means hoặc trọng số neuron SOM, tham số chuẩn hóa
+    x' = (x - mean) / scale (mặc định không chuẩn hóa) và metadata (thuật toán, số cụm, lưới, tên thuộc tính, ...).
+    """
+    n_attrs = weights.shape[1]
+    return {
+        "weights": np.asarray(weights, dtype=float),
+        "feature_mean": np.zeros(n_attrs) if feature_mean is None else np.asarray(feature_mean, dtype=float),
+        "feature_scale": np.ones(n_attrs) if feature_scale is None else np.asarray(feature_scale, dtype=float),
+        "metadata": metadata,
+    }
+
+def save_model(model, path: str):
+    # File nhị phân .npz: các mảng float64 cộng metadata dạng chuỗi JSON (không cần pickle khi đọc lại)
+    np.savez(path, weights=model["weights"], feature_mean=model["feature_mean"],
+             feature_scale=model["feature_scale"], metadata=np.array(json.dumps(model["metadata"], default=str)))
+
+def load_model(path: str):
+    with np.load(path, allow_pickle=False) as archive:
+        return create_model(archive["weights"], archive["feature_mean"], archive["feature_scale"],
+                            **json.loads(str(archive["metadata"])))
+
+def normalized_chunks(model, data: np.ndarray, chunk_size: int):
+    # Duyệt dữ liệu theo khối (mảng trong bộ nhớ hoặc memmap), trả về (vị trí bắt đầu, khối đã chuẩn hóa);
+    # khối được thu nhỏ khi mô hình có nhiều trọng tâm / neuron để ma trận khoảng cách không vượt MAX_SCORE_CELLS
+    chunk_size = max(1, min(chunk_size, MAX_SCORE_CELLS // len(model["weights"])))
+    for start in range(0, data.shape[0], chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=float)
+        yield start, (chunk - model["feature_mean"]) / model["feature_scale"]
+
+def transform(model, data: np.ndarray, chunk_size: int = 65536):
+    """
+    Khoảng cách Euclidean từ mỗi mẫu tới mỗi trọng tâm / neuron (n_samples x n_units), sau khi chuẩn hóa theo mô hình.
+    """
+    weights = model["weights"]
+    weight_norms = np.einsum("ij,ij->i", weights, weights)
+    distances = np.empty((data.shape[0], len(weights)))
+    for start, chunk in normalized_chunks(model, data, chunk_size):
+        squared = weight_norms - 2.0 * (chunk @ weights.T) + np.einsum("ij,ij->i", chunk, chunk)[:, None]
+        distances[start:start + len(chunk)] = np.sqrt(np.maximum(squared, 0.0))
+    return distances
+
+def assign(model, data: np.ndarray, chunk_size: int = 65536):
+    """
+    Chỉ số trọng tâm / neuron gần nhất của từng mẫu mới, xử lý theo khối: argmin ||w||² - 2x·w (bỏ ||x||² không đổi).
+    Với lưới SOM rows x cols, neuron j nằm ở hàng j // cols, cột j % cols.
+    """
+    weights = model["weights"]
+    weight_norms = np.einsum("ij,ij->i", weights, weights)
+    labels = np.empty(data.shape[0], dtype=np.int64)
+    for start, chunk in normalized_chunks(model, data, chunk_size):
+        labels[start:start + len(chunk)] = np.argmin(weight_norms - 2.0 * (chunk @ weights.T), axis=1)
+    return labels
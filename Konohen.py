@@ -1,54 +1,258 @@
+import time
 import numpy as np
 import pandas as pd
 import tkinter as tk
-from tkinter import filedialog
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from tkinter import ttk, filedialog
+from Clustering_Common import (MAX_LISTED_SAMPLES, MAX_SCORE_CELLS, create_reporter, report, dump, close_reporter,
+                               feature_statistics, create_model, save_model)
 
-def kohonen_algorithm(data: pd.DataFrame, n_clusters: int, learning_rate: float, epochs: int, text_box):
-    np.random.seed(42)
-    
-    # Tách nhãn và vector thuộc tính
-    labels = data.iloc[:, 0]  # Cột đầu tiên là nhãn
-    input_vectors = data.iloc[:, 1:].values  # Các cột còn lại là vector thuộc tính
-    n_samples, n_attrs = input_vectors.shape
+def find_bmus(input_vectors: np.ndarray, weights: np.ndarray, chunk_size: int = 65536):
+    """
+    Tìm neuron thắng (BMU) cho mọi vector theo từng khối: ||x - w||² = ||x||² - 2x·w + ||w||², phần x·w là một
+    phép nhân ma trận nên không cần vòng lặp Python theo từng mẫu. Trả về (chỉ số BMU, khoảng cách Euclidean).
+    Số dòng mỗi khối được giảm khi có nhiều neuron để ma trận điểm số không vượt quá MAX_SCORE_CELLS phần tử.
+    """
+    n_samples = input_vectors.shape[0]
+    chunk_size = max(1, min(chunk_size, MAX_SCORE_CELLS // len(weights)))
+    bmus = np.empty(n_samples, dtype=np.int64)
+    distances = np.empty(n_samples)
+    weight_norms = np.einsum("ij,ij->i", weights, weights)
+    for start in range(0, n_samples, chunk_size):
+        chunk = np.asarray(input_vectors[start:start + chunk_size], dtype=float)
+        scores = weight_norms - 2.0 * (chunk @ weights.T)
+        winner = np.argmin(scores, axis=1)
+        bmus[start:start + len(chunk)] = winner
+        squared = scores[np.arange(len(chunk)), winner] + np.einsum("ij,ij->i", chunk, chunk)
+        distances[start:start + len(chunk)] = np.sqrt(np.maximum(squared, 0.0))
+    return bmus, distances
 
-    # Khởi tạo trọng số ngẫu nhiên cho các neurons (cụm)
-    weights = np.random.rand(n_clusters, n_attrs) * np.max(input_vectors, axis=0)
-    text_box.insert(tk.END, "Bước 0 - Vector trọng số khởi tạo:\n")
-    text_box.insert(tk.END, f"{weights}\n")
+def som_partial_sums(chunk: np.ndarray, weights: np.ndarray):
+    """
+    Phần việc của một khối dữ liệu trong batch-SOM: tổng vector và số mẫu mà mỗi neuron thắng (tử số / mẫu số
+    trước khi nhân ma trận lân cận) cùng tổng khoảng cách tới BMU. Trả về (sums, counts, tổng khoảng cách).
+    """
+    chunk = np.asarray(chunk, dtype=float)
+    bmus, distances = find_bmus(chunk, weights)
+    sums = np.zeros(weights.shape)
+    np.add.at(sums, bmus, chunk)
+    return sums, np.bincount(bmus, minlength=len(weights)), distances.sum()
+
+# Dữ liệu huấn luyện của tiến trình con trong chế độ song song, được gán một lần khi tiến trình khởi động
+WORKER_DATA = {}
+
+def init_som_worker(input_vectors: np.ndarray):
+    WORKER_DATA["input_vectors"] = input_vectors
+
+def som_shard_partial_sums(start: int, stop: int, weights: np.ndarray):
+    return som_partial_sums(WORKER_DATA["input_vectors"][start:stop], weights)
 
+def create_som_executor(input_vectors: np.ndarray, n_jobs: int = None):
+    """
+    Nhóm tiến trình cho batch-SOM song song: dữ liệu chỉ được gửi cho mỗi tiến trình một lần lúc khởi động,
+    mỗi epoch chỉ truyền trọng số hiện tại và nhận về tổng riêng phần của từng khối.
+    """
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=init_som_worker, initargs=(input_vectors,))
+
+def batch_som_epoch(input_vectors: np.ndarray, weights: np.ndarray, neighbourhood: np.ndarray = None,
+                    chunk_size: int = 16384, executor: ProcessPoolExecutor = None):
+    """
+    Một epoch của batch-SOM: gán BMU cho toàn bộ dữ liệu, cộng dồn tổng vector và số mẫu của từng neuron, rồi
+    đặt w_j = Σ_i h(j, bmu_i) x_i / Σ_i h(j, bmu_i). neighbourhood là ma trận h (n_neurons x n_neurons);
+    None tương đương chỉ cập nhật neuron thắng. Neuron không nhận được mẫu nào giữ nguyên trọng số.
+    Dữ liệu được chia thành các khối chunk_size hàng; executor (create_som_executor) tính các khối song song.
+    Tổng riêng phần luôn được gộp theo thứ tự khối nên kết quả song song trùng khớp từng bit với chạy tuần tự
+    cùng chunk_size.
+    Trả về (trọng số mới, số mẫu thắng của mỗi neuron, tổng khoảng cách tới BMU) - BMU tính theo trọng số cũ.
+    """
+    n_neurons, n_attrs = weights.shape
+    starts = range(0, input_vectors.shape[0], chunk_size)
+    stops = [start + chunk_size for start in starts]
+    if executor is None:
+        partials = (som_partial_sums(input_vectors[start:stop], weights) for start, stop in zip(starts, stops))
+    else:
+        partials = executor.map(som_shard_partial_sums, starts, stops, repeat(weights))
+
+    sums = np.zeros((n_neurons, n_attrs))
+    wins = np.zeros(n_neurons, dtype=np.int64)
+    total_distance = 0.0
+    for chunk_sums, chunk_wins, chunk_distance in partials:
+        sums += chunk_sums
+        wins += chunk_wins
+        total_distance += chunk_distance
+
+    counts = wins.astype(float)
+    if neighbourhood is not None:
+        sums = neighbourhood @ sums
+        counts = neighbourhood @ counts
+    new_weights = weights.copy()
+    filled = counts > 0
+    new_weights[filled] = sums[filled] / counts[filled, None]
+    return new_weights, wins, total_distance
+
+def grid_coordinates(rows: int, cols: int) -> np.ndarray:
+    # Tọa độ (hàng, cột) của từng neuron trên lưới, neuron j nằm ở (j // cols, j % cols)
+    return np.indices((rows, cols)).reshape(2, -1).T.astype(float)
+
+def gaussian_neighbourhood(coords: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    Ma trận lân cận h(j, k) = exp(-||r_j - r_k||² / (2σ²)) giữa các neuron theo khoảng cách trên lưới,
+    h(j, j) = 1. Kích thước n_neurons x n_neurons (lưới 50x50 khoảng 50 MB).
+    """
+    squared = ((coords[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2)
+    return np.exp(-squared / (2.0 * sigma ** 2))
+
+def neighbourhood_radius(epoch: int, epochs: int, sigma_start: float, sigma_end: float) -> float:
+    # Bán kính giảm theo hàm mũ từ sigma_start (epoch đầu) đến sigma_end (epoch cuối)
+    if epochs <= 1:
+        return sigma_end
+    return sigma_start * (sigma_end / sigma_start) ** (epoch / (epochs - 1))
+
+def train_som(input_vectors: np.ndarray, weights: np.ndarray, learning_rate: float, epochs: int, reporter, mode: str,
+              chunk_size: int, coords: np.ndarray, sigma_start: float, sigma_end: float,
+              executor: ProcessPoolExecutor = None) -> np.ndarray:
+    # Các epoch huấn luyện (online, batch hoặc song song), trả về trọng số cuối
+    n_samples = input_vectors.shape[0]
+    n_clusters = weights.shape[0]
     # Lặp qua các epoch
     for epoch in range(epochs):
-        text_box.insert(tk.END, f"\nEpoch {epoch + 1}:\n")
-        text_box.insert(tk.END, f"Tốc độ học: {learning_rate:.4f}\n")
-        
+        epoch_start = time.perf_counter()
+        previous_weights = weights.copy()
+        wins = np.zeros(n_clusters, dtype=int)
+        total_distance = 0.0
+        neighbourhood = None
+        radius_info = ""
+        if coords is not None:
+            sigma = neighbourhood_radius(epoch, epochs, sigma_start, sigma_end)
+            neighbourhood = gaussian_neighbourhood(coords, sigma)
+            radius_info = f"bán kính {sigma:.3f}, "
+
+        if mode != "online":
+            weights, wins, total_distance = batch_som_epoch(input_vectors, weights, neighbourhood, chunk_size,
+                                                            executor)
+            report(reporter, f"Epoch {epoch + 1} ({mode}): {radius_info}sai số lượng tử {total_distance / n_samples:.4f}, "
+                             f"dịch chuyển trọng số {np.linalg.norm(weights - previous_weights):.6f}, "
+                             f"số mẫu thắng mỗi neuron {wins.tolist() if n_clusters <= 20 else f'{wins.min()}..{wins.max()}'}, "
+                             f"{(time.perf_counter() - epoch_start) * 1000:.2f} ms "
+                             f"(tổng {time.perf_counter() - reporter['start']:.2f} s)")
+            dump(reporter, f"Vector trọng số sau Epoch {epoch + 1}:", weights)
+            continue
+
         for i, x in enumerate(input_vectors):
             # Tính khoảng cách Euclidean từ vector x đến các neurons
             distances = np.linalg.norm(weights - x, axis=1)
             winner_idx = np.argmin(distances)  # Chọn neuron gần nhất
+            wins[winner_idx] += 1
+            total_distance += distances[winner_idx]
 
-            # Cập nhật trọng số của neuron thắng
-            weights[winner_idx] += learning_rate * (x - weights[winner_idx])
-            text_box.insert(tk.END, f"Vector {i+1} cập nhật neuron {winner_idx+1}:\n")
-            text_box.insert(tk.END, f"{weights}\n")
+            # Cập nhật trọng số của neuron thắng (và các neuron lân cận trên lưới nếu có)
+            if neighbourhood is None:
+                weights[winner_idx] += learning_rate * (x - weights[winner_idx])
+            else:
+                weights += (learning_rate * neighbourhood[winner_idx])[:, None] * (x - weights)
+            dump(reporter, f"Epoch {epoch + 1} - vector {i + 1} cập nhật neuron {winner_idx + 1}:", weights)
+
+        # Tóm tắt epoch
+        report(reporter, f"Epoch {epoch + 1}: tốc độ học {learning_rate:.4f}, {radius_info}"
+                         f"sai số lượng tử {total_distance / n_samples:.4f}, "
+                         f"dịch chuyển trọng số {np.linalg.norm(weights - previous_weights):.6f}, "
+                         f"số mẫu thắng mỗi neuron {wins.tolist() if n_clusters <= 20 else f'{wins.min()}..{wins.max()}'}, "
+                         f"{(time.perf_counter() - epoch_start) * 1000:.2f} ms "
+                         f"(tổng {time.perf_counter() - reporter['start']:.2f} s)")
+        dump(reporter, f"Vector trọng số sau Epoch {epoch + 1}:", weights)
 
         # Giảm tốc độ học sau mỗi epoch
         learning_rate /= 2
 
-        # Hiển thị trọng số sau mỗi epoch
-        text_box.insert(tk.END, f"Vector trọng số sau Epoch {epoch + 1}:\n")
-        text_box.insert(tk.END, f"{weights}\n")
+    return weights
+
+def kohonen_algorithm(data: pd.DataFrame, n_clusters: int, learning_rate: float, epochs: int, text_box,
+                      verbosity: int = 1, dump_path: str = None, mode: str = "online", chunk_size: int = 16384,
+                      grid_shape: tuple = None, sigma_start: float = None, sigma_end: float = 0.5,
+                      standardize: bool = False, n_jobs: int = None):
+    """
+    mode = "online": cập nhật neuron thắng sau từng mẫu với tốc độ học giảm một nửa mỗi epoch.
+    mode = "batch": mỗi epoch tính BMU cho toàn bộ dữ liệu theo khối chunk_size rồi cập nhật mọi neuron một lần
+    (batch_som_epoch); chế độ này không dùng learning_rate.
+    mode = "parallel": như "batch" nhưng các khối được tính trên n_jobs tiến trình (mặc định bằng số CPU),
+    kết quả giống hệt "batch".
+    grid_shape = (rows, cols): bản đồ tự tổ chức 2 chiều với rows * cols neuron (bỏ qua n_clusters), các neuron
+    lân cận neuron thắng cũng được kéo theo với trọng số Gauss, bán kính giảm từ sigma_start (mặc định
+    max(rows, cols) / 2) xuống sigma_end. grid_shape = None giữ kiểu chỉ cập nhật neuron thắng.
+    standardize = True: chuẩn hóa từng thuộc tính về trung bình 0, độ lệch chuẩn 1 trước khi huấn luyện.
+    Trả về mô hình (create_model) để lưu bằng save_model; nạp lại và gán dữ liệu mới
+    bằng load_model / assign của Clustering_Common.
+    """
+    if mode not in ("online", "batch", "parallel"):
+        raise ValueError(f"Chế độ huấn luyện không hợp lệ: {mode}")
+    coords = None
+    if grid_shape is not None:
+        rows, cols = grid_shape
+        if rows <= 0 or cols <= 0:
+            raise ValueError(f"Kích thước lưới không hợp lệ: {grid_shape}")
+        n_clusters = rows * cols
+        coords = grid_coordinates(rows, cols)
+        if sigma_start is None:
+            sigma_start = max(rows, cols) / 2.0
+    np.random.seed(42)
+    reporter = create_reporter(text_box, verbosity, dump_path)
+    try:
+        return run_with_reporter(data, n_clusters, learning_rate, epochs, reporter, mode, chunk_size, grid_shape,
+                                 coords, sigma_start, sigma_end, standardize, n_jobs)
+    finally:
+        close_reporter(reporter)
+
+def run_with_reporter(data: pd.DataFrame, n_clusters: int, learning_rate: float, epochs: int, reporter, mode: str,
+                      chunk_size: int, grid_shape: tuple, coords: np.ndarray, sigma_start: float, sigma_end: float,
+                      standardize: bool, n_jobs: int):
+    # Tách nhãn và vector thuộc tính
+    labels = data.iloc[:, 0]  # Cột đầu tiên là nhãn
+    input_vectors = data.iloc[:, 1:].values  # Các cột còn lại là vector thuộc tính
+    n_samples, n_attrs = input_vectors.shape
+    initial_learning_rate = learning_rate
+
+    feature_mean = feature_scale = None
+    if standardize:
+        feature_mean, feature_scale = feature_statistics(input_vectors)
+        input_vectors = (input_vectors - feature_mean) / feature_scale
+
+    # Khởi tạo trọng số ngẫu nhiên cho các neurons (cụm)
+    weights = np.random.rand(n_clusters, n_attrs) * np.max(input_vectors, axis=0)
+    report(reporter, f"{n_samples} mẫu, {n_attrs} thuộc tính, {n_clusters} neuron"
+                     + (f" (lưới {grid_shape[0]}x{grid_shape[1]})" if coords is not None else ""), level=0)
+    dump(reporter, "Bước 0 - Vector trọng số khởi tạo:", weights)
+    # Nhóm tiến trình của chế độ song song luôn được đóng, kể cả khi một epoch gặp lỗi
+    executor = create_som_executor(input_vectors, n_jobs) if mode == "parallel" else None
+    try:
+        weights = train_som(input_vectors, weights, learning_rate, epochs, reporter, mode, chunk_size, coords,
+                            sigma_start, sigma_end, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     # Gán cụm cho từng vector dữ liệu
-    text_box.insert(tk.END, "\nKết quả phân cụm cuối cùng:\n")
-    clusters = {i: [] for i in range(n_clusters)}
-    for i, x in enumerate(input_vectors):
-        distances = np.linalg.norm(weights - x, axis=1)
-        winner_idx = np.argmin(distances)
-        clusters[winner_idx].append(labels.iloc[i])
+    report(reporter, "\nKết quả phân cụm cuối cùng:", level=0)
+    bmus, bmu_distances = find_bmus(input_vectors, weights, chunk_size)
+    label_values = labels.to_numpy()
+    for cluster_idx in range(n_clusters):
+        members = np.flatnonzero(bmus == cluster_idx)
+        if len(members) == 0:
+            continue
+        name = f"Cụm {cluster_idx + 1}"
+        if coords is not None:
+            name = f"Neuron ({cluster_idx // grid_shape[1] + 1}, {cluster_idx % grid_shape[1] + 1})"
+        if n_samples > MAX_LISTED_SAMPLES:
+            report(reporter, f"{name}: {len(members)} mẫu", level=0)
+        else:
+            report(reporter, f"{name}: {', '.join(map(str, label_values[members]))}", level=0)
 
-    for cluster_idx, items in clusters.items():
-        if items:
-            text_box.insert(tk.END, f"Cụm {cluster_idx + 1}: {', '.join(map(str, items))}\n")
+    return create_model(weights, feature_mean, feature_scale, algorithm="som", mode=mode,
+                        n_clusters=n_clusters, grid_shape=list(grid_shape) if coords is not None else None,
+                        epochs=epochs, learning_rate=initial_learning_rate, n_samples=n_samples,
+                        feature_names=[str(name) for name in data.columns[1:]],
+                        quantization_error=float(bmu_distances.mean()),
+                        created=time.strftime("%Y-%m-%d %H:%M:%S"))
 
 def run_kohonen():
     # Tạo giao diện tkinter
@@ -69,6 +273,31 @@ def run_kohonen():
     cluster_entry = tk.Entry(input_frame, width=5)
     cluster_entry.pack(side=tk.LEFT, padx=5)
 
+    # Mức chi tiết của tiến trình: 0 = chỉ kết quả, 1 = tóm tắt từng epoch, 2 = thêm ghi trọng số đầy đủ ra file
+    tk.Label(input_frame, text="Chi tiết:").pack(side=tk.LEFT)
+    verbosity_box = ttk.Combobox(input_frame, values=["0", "1", "2"], width=3, state="readonly")
+    verbosity_box.current(1)
+    verbosity_box.pack(side=tk.LEFT, padx=5)
+
+    # Chế độ huấn luyện: online = cập nhật sau từng mẫu, batch = cập nhật một lần mỗi epoch trên toàn bộ dữ liệu,
+    # parallel = batch chia khối cho nhiều tiến trình
+    tk.Label(input_frame, text="Chế độ:").pack(side=tk.LEFT)
+    mode_box = ttk.Combobox(input_frame, values=["online", "batch", "parallel"], width=7, state="readonly")
+    mode_box.current(0)
+    mode_box.pack(side=tk.LEFT, padx=5)
+
+    # Lưới SOM dạng "hàng x cột" (ví dụ 10x10); để trống thì dùng danh sách neuron phẳng theo số nhóm
+    grid_frame = tk.Frame(root)
+    grid_frame.pack(pady=5)
+    tk.Label(grid_frame, text="Lưới SOM (hàng x cột, để trống nếu không dùng):").pack(side=tk.LEFT)
+    grid_entry = tk.Entry(grid_frame, width=8)
+    grid_entry.pack(side=tk.LEFT, padx=5)
+
+    # Chuẩn hóa thuộc tính trước khi huấn luyện; mô hình của lần chạy gần nhất có thể lưu ra file .npz
+    standardize_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(grid_frame, text="Chuẩn hóa", variable=standardize_var).pack(side=tk.LEFT, padx=5)
+    last_model = {"model": None}
+
     def load_data():
         filepath = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
         if not filepath:
@@ -81,12 +310,19 @@ def run_kohonen():
             return None
 
     def start_algorithm():
+        grid_shape = None
         try:
-            n_clusters = int(cluster_entry.get())
+            if grid_entry.get().strip():
+                grid_shape = tuple(int(v) for v in grid_entry.get().lower().split("x"))
+                if len(grid_shape) != 2 or min(grid_shape) <= 0:
+                    raise ValueError("Lưới phải có dạng hàng x cột.")
+                n_clusters = grid_shape[0] * grid_shape[1]
+            else:
+                n_clusters = int(cluster_entry.get())
             if n_clusters <= 0:
                 raise ValueError("Số cụm phải là số nguyên dương.")
         except ValueError:
-            text_box.insert(tk.END, "Lỗi: Vui lòng nhập số cụm hợp lệ (số nguyên dương).\n")
+            text_box.insert(tk.END, "Lỗi: Vui lòng nhập số cụm hợp lệ (số nguyên dương) hoặc lưới dạng hàng x cột.\n")
             return
 
         data = load_data()
@@ -97,14 +333,34 @@ def run_kohonen():
         learning_rate = 0.4  # Tốc độ học ban đầu
         epochs = 5  # Số lần lặp
 
+        verbosity = int(verbosity_box.get())
+        dump_path = None
+        if verbosity >= 2:
+            dump_path = filedialog.asksaveasfilename(title="Lưu chi tiết tiến trình", defaultextension=".txt",
+                                                     filetypes=[("Text files", "*.txt")]) or None
+
         # Xóa nội dung cũ
         text_box.delete(1.0, tk.END)
         # Chạy thuật toán Kohonen
-        kohonen_algorithm(data, n_clusters, learning_rate, epochs, text_box)
+        last_model["model"] = kohonen_algorithm(data, n_clusters, learning_rate, epochs, text_box,
+                                                verbosity=verbosity, dump_path=dump_path, mode=mode_box.get(),
+                                                grid_shape=grid_shape, standardize=standardize_var.get())
+
+    def save_current_model():
+        if last_model["model"] is None:
+            text_box.insert(tk.END, "Chưa có mô hình để lưu, hãy chạy thuật toán trước.\n")
+            return
+        path = filedialog.asksaveasfilename(title="Lưu mô hình", defaultextension=".npz",
+                                            filetypes=[("NumPy model files", "*.npz")])
+        if path:
+            save_model(last_model["model"], path)
+            text_box.insert(tk.END, f"Đã lưu mô hình vào {path}\n")
 
     # Nút tải dữ liệu và bắt đầu
     load_button = tk.Button(root, text="Tải dữ liệu Excel", command=start_algorithm)
     load_button.pack(pady=5)
+    save_button = tk.Button(root, text="Lưu mô hình", command=save_current_model)
+    save_button.pack(pady=5)
 
     root.mainloop()
 
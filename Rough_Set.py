@@ -1,45 +1,357 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import pandas as pd
-from itertools import combinations
-from typing import Set, Dict, List, Tuple
+import numpy as np
+from collections import OrderedDict
+from typing import Iterable, Set, Dict, List, Tuple
 
+# Ma trận phân biệt dạng gọn: cặp dòng pairs[k] = (i, j) có quyết định khác nhau, masks[k] là bitmask các thuộc tính
+# khác nhau giữa hai dòng (thuộc tính attributes[a] ứng với bit a % 64 của từ masks[k, a // 64], kiểu uint64)
+DiscernibilityMatrix = Dict[str, object]
 
-def generate_discernibility_matrix(data: pd.DataFrame) -> Dict[Tuple[int, int], Set[str]]:
-    n = len(data)
+# Bộ tính xấp xỉ tập thô: bảng đã mã hóa số nguyên và bộ nhớ đệm phân hoạch theo tập thuộc tính (LRU)
+RoughSetEngine = Dict[str, object]
+
+# Số ô (cặp dòng x thuộc tính) tối đa được so sánh trong một khối khi dựng ma trận phân biệt
+MAX_BLOCK_CELLS = 1 << 24
+
+
+def encode_column(values: pd.Series) -> np.ndarray:
+    # Mã số nguyên không âm cho một cột. Ô trống (NaN) khác mọi giá trị, kể cả ô trống khác (như so sánh != của
+    # pandas), nên mỗi ô trống nhận một mã riêng nằm sau các mã của giá trị thật
+    codes, uniques = pd.factorize(values)
+    codes = codes.astype(np.int64)
+    missing = codes < 0
+    codes[missing] = len(uniques) + np.arange(int(missing.sum()))
+    return codes
+
+
+def encode_table(data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    # Mã hóa mỗi cột thành số nguyên một lần: trả về (mã các thuộc tính điều kiện n x m, mã cột quyết định)
+    codes = np.column_stack([encode_column(data[column]) for column in data.columns])
+    return codes[:, :-1], codes[:, -1]
+
+
+def pack_masks(diff: np.ndarray) -> np.ndarray:
+    # Nén ma trận bool (số cặp x m) thành các từ uint64, bit a ứng với thuộc tính thứ a
+    n_words = max(1, (diff.shape[1] + 63) // 64)
+    packed = np.packbits(diff, axis=1, bitorder="little")
+    padded = np.zeros((diff.shape[0], n_words * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view("<u8")
+
+
+def attributes_to_mask(attrs, attributes: List[str]) -> np.ndarray:
+    diff = np.zeros((1, len(attributes)), dtype=bool)
+    for attr in attrs:
+        diff[0, attributes.index(attr)] = True
+    return pack_masks(diff)[0]
+
+
+def mask_to_attributes(mask: np.ndarray, attributes: List[str]) -> Set[str]:
+    bits = np.unpackbits(np.ascontiguousarray(mask, dtype="<u8").view(np.uint8), bitorder="little")
+    return {attributes[a] for a in np.flatnonzero(bits[:len(attributes)])}
+
+
+def discernibility_pairs(conditions: np.ndarray, decisions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n, m = conditions.shape
+
+    # So sánh theo khối dòng i với mọi dòng j > i bằng broadcasting; chỉ giữ cặp có quyết định khác nhau
+    block_size = max(1, MAX_BLOCK_CELLS // max(1, n * m))
+    pairs = []
+    masks = []
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        keep = (np.arange(n)[None, :] > rows[:, None]) & (decisions[rows][:, None] != decisions[None, :])
+        i, j = np.nonzero(keep)
+        if len(i) == 0:
+            continue
+        diff = conditions[rows][i] != conditions[j]
+        pairs.append(np.column_stack([rows[i], j]))
+        masks.append(pack_masks(diff))
+
+    n_words = max(1, (m + 63) // 64)
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64), np.empty((0, n_words), dtype="<u8")
+    return np.concatenate(pairs), np.concatenate(masks)
+
+
+def generate_discernibility_matrix(data: pd.DataFrame) -> DiscernibilityMatrix:
     attributes = list(data.columns[:-1])  # Bỏ cột quyết định
-    decision_column = data.columns[-1]
-    discernibility_matrix = {}
+    conditions, decisions = encode_table(data)
+    pairs, masks = discernibility_pairs(conditions, decisions)
+    return {"attributes": attributes, "pairs": pairs, "masks": masks}
+
 
-    for i, j in combinations(range(n), 2):
-        if data.iloc[i][decision_column] != data.iloc[j][decision_column]:  # Chỉ xét cặp có quyết định khác nhau
-            diff_attributes = {attr for attr in attributes if data.iloc[i][attr] != data.iloc[j][attr]}
-            discernibility_matrix[(i, j)] = diff_attributes
+def indiscernibility_classes(conditions: np.ndarray, decisions: np.ndarray) -> Dict[str, np.ndarray]:
+    # Gom các dòng trùng nhau (cả điều kiện lẫn quyết định) thành một lớp: dòng đại diện đầu tiên, số dòng của lớp
+    # và lớp của từng dòng gốc
+    _, representatives, inverse, counts = np.unique(np.column_stack([conditions, decisions]), axis=0,
+                                                    return_index=True, return_inverse=True, return_counts=True)
+    return {
+        "conditions": conditions[representatives],
+        "decisions": decisions[representatives],
+        "representatives": representatives,
+        "counts": counts,
+        "inverse": inverse.ravel(),
+    }
 
-    return discernibility_matrix
 
+def generate_reduced_discernibility_matrix(data: pd.DataFrame) -> DiscernibilityMatrix:
+    # Chỉ so sánh đại diện của các lớp có quyết định khác nhau, rồi bỏ các ô trùng nhau; pairs[k] là một cặp dòng gốc
+    # sinh ra ô k và counts[k] là số cặp dòng gốc có cùng ô đó. Cùng tập ô (khác thứ tự) với generate_discernibility_matrix
+    attributes = list(data.columns[:-1])  # Bỏ cột quyết định
+    conditions, decisions = encode_table(data)
+    classes = indiscernibility_classes(conditions, decisions)
+    class_pairs, class_masks = discernibility_pairs(classes["conditions"], classes["decisions"])
+    if len(class_masks) == 0:
+        return {"attributes": attributes, "pairs": class_pairs, "masks": class_masks,
+                "counts": np.empty(0, dtype=np.int64), "n_classes": len(classes["counts"])}
 
-def check_reduct_validity(reduct: Set[str], matrix: Dict[Tuple[int, int], Set[str]]) -> bool:
-    for attributes in matrix.values():
-        if not any(attr in reduct for attr in attributes):
-            return False
-    return True
+    masks, first, inverse = np.unique(class_masks, axis=0, return_index=True, return_inverse=True)
+    pair_counts = classes["counts"][class_pairs[:, 0]] * classes["counts"][class_pairs[:, 1]]
+    return {
+        "attributes": attributes,
+        "pairs": classes["representatives"][class_pairs[first]],
+        "masks": masks,
+        "counts": np.bincount(inverse.ravel(), weights=pair_counts).astype(np.int64),
+        "n_classes": len(classes["counts"]),
+    }
 
 
-def find_all_reducts(matrix: Dict[Tuple[int, int], Set[str]], all_attributes: Set[str]) -> List[Set[str]]:
-    reducts = []
-    for size in range(1, len(all_attributes) + 1):
-        for subset in combinations(all_attributes, size):
-            subset_set = set(subset)
-            if check_reduct_validity(subset_set, matrix):
-                # Loại bỏ các rút gọn không tối thiểu
-                if not any(existing.issubset(subset_set) for existing in reducts):
-                    reducts.append(subset_set)
-    return reducts
+def check_reduct_validity(reduct: Set[str], matrix: DiscernibilityMatrix) -> bool:
+    # Tập thuộc tính hợp lệ khi giao khác rỗng với mọi ô của ma trận phân biệt
+    reduct_mask = attributes_to_mask(reduct, matrix["attributes"])
+    return bool(((matrix["masks"] & reduct_mask) != 0).any(axis=1).all())
+
+
+def masks_to_ints(masks: np.ndarray) -> List[int]:
+    # Mỗi ô (dãy từ uint64) thành một số nguyên Python: bit a ứng với thuộc tính thứ a, không giới hạn số thuộc tính
+    data = np.ascontiguousarray(masks, dtype="<u8")
+    return [int.from_bytes(row.tobytes(), "little") for row in data]
+
+
+def absorb_clauses(clauses: List[int]) -> List[int]:
+    # Luật hấp thu: bỏ mọi mệnh đề chứa một mệnh đề khác, chỉ giữ các mệnh đề tối tiểu. Duyệt theo số thuộc tính
+    # tăng dần nên mệnh đề con luôn được giữ trước
+    minimal = []
+    for clause in sorted(set(clauses), key=lambda clause: (clause.bit_count(), clause)):
+        if not any(kept & clause == kept for kept in minimal):
+            minimal.append(clause)
+    return minimal
+
+
+def simplify_discernibility_function(matrix: DiscernibilityMatrix) -> List[int]:
+    # Hàm phân biệt dạng tích các tổng, mỗi ô của ma trận là một mệnh đề (tổng các thuộc tính khác nhau)
+    return absorb_clauses(masks_to_ints(matrix["masks"]))
+
+
+def minimal_transversals(clauses: List[int], n_attributes: int) -> List[int]:
+    # Liệt kê mọi tập chặn tối tiểu (minimal hitting set) của các mệnh đề theo MMCS (Murakami & Uno):
+    # mở rộng dần tập S bằng thuộc tính của mệnh đề chưa bị chặn có ít ứng viên nhất, và chỉ đi tiếp khi mỗi phần tử
+    # của S vẫn là phần tử duy nhất chặn ít nhất một mệnh đề (crit), nên mọi tập sinh ra đều tối tiểu, không trùng lặp
+    if not clauses:
+        return [0]
+    if 0 in clauses:
+        return []  # Có cặp dòng mâu thuẫn không thể phân biệt: không tồn tại tập rút gọn
+
+    # occurrences[a]: bitmask các mệnh đề chứa thuộc tính a
+    occurrences = [0] * n_attributes
+    for index, clause in enumerate(clauses):
+        for a in range(n_attributes):
+            if clause >> a & 1:
+                occurrences[a] |= 1 << index
+
+    transversals = []
+
+    def search(selected: int, candidates: int, crit: Dict[int, int], uncovered: int) -> None:
+        if not uncovered:
+            transversals.append(selected)
+            return
+        # Chọn mệnh đề chưa bị chặn có ít thuộc tính ứng viên nhất
+        best = None
+        pending = uncovered
+        while pending:
+            index = (pending & -pending).bit_length() - 1
+            pending &= pending - 1
+            options = clauses[index] & candidates
+            if best is None or options.bit_count() < best.bit_count():
+                best = options
+                if not best:
+                    return
+        candidates &= ~best
+        while best:
+            attr_bit = best & -best
+            best &= best - 1
+            a = attr_bit.bit_length() - 1
+            hit = occurrences[a]
+            new_crit = {f: covered & ~hit for f, covered in crit.items()}
+            if all(new_crit.values()):
+                new_crit[a] = uncovered & hit
+                search(selected | attr_bit, candidates, new_crit, uncovered & ~hit)
+            candidates |= attr_bit
 
+    search(0, (1 << n_attributes) - 1, {}, (1 << len(clauses)) - 1)
+    return transversals
 
-def rough_set_reduction(data: pd.DataFrame) -> List[Set[str]]:
-    discernibility_matrix = generate_discernibility_matrix(data)
+
+def find_all_reducts(matrix: DiscernibilityMatrix, all_attributes: Set[str]) -> List[Set[str]]:
+    # Rút gọn = tập chặn tối tiểu của hàm phân biệt đã rút gọn bằng luật hấp thu (chỉ xét các thuộc tính trong
+    # all_attributes); sắp theo số thuộc tính rồi thứ tự cột
+    attributes = matrix["attributes"]
+    allowed = sum(1 << a for a, attr in enumerate(attributes) if attr in all_attributes)
+    clauses = absorb_clauses([clause & allowed for clause in masks_to_ints(matrix["masks"])])
+    transversals = minimal_transversals(clauses, len(attributes))
+    transversals.sort(key=lambda mask: (mask.bit_count(), [-(mask >> a & 1) for a in range(len(attributes))]))
+    return [{attr for a, attr in enumerate(attributes) if mask >> a & 1} for mask in transversals]
+
+
+def compute_core(matrix: DiscernibilityMatrix) -> Set[str]:
+    # Lõi = giao của mọi rút gọn = các thuộc tính đứng một mình trong một ô của ma trận phân biệt
+    attributes = matrix["attributes"]
+    return {attributes[clause.bit_length() - 1] for clause in masks_to_ints(matrix["masks"]) if clause.bit_count() == 1}
+
+
+def refine_partition(block_ids: np.ndarray, column: np.ndarray) -> np.ndarray:
+    # Tách mỗi khối theo giá trị của một cột (mã số nguyên không âm từ encode_column): băm cặp (khối, giá trị)
+    # thành mã khối mới 0..k-1
+    keys = block_ids * np.int64(column.max() + 1) + column if len(column) else block_ids
+    return pd.factorize(keys)[0].astype(np.int64)
+
+
+def positive_region(block_ids: np.ndarray, decisions: np.ndarray) -> np.ndarray:
+    # Dòng thuộc miền dương khi mọi dòng cùng khối có cùng quyết định (khối nằm trọn trong một lớp quyết định)
+    if len(block_ids) == 0:
+        return np.zeros(0, dtype=bool)
+    n_blocks = block_ids.max() + 1
+    lowest = np.full(n_blocks, decisions.max())
+    highest = np.full(n_blocks, decisions.min())
+    np.minimum.at(lowest, block_ids, decisions)
+    np.maximum.at(highest, block_ids, decisions)
+    return (lowest == highest)[block_ids]
+
+
+def create_rough_set_engine(data: pd.DataFrame, cache_size: int = 256) -> RoughSetEngine:
+    # Mã hóa bảng một lần; phân hoạch của mỗi tập thuộc tính được lưu đệm, tối đa cache_size tập (bỏ tập ít dùng nhất)
+    conditions, decisions = encode_table(data)
+    return {
+        "attributes": list(data.columns[:-1]),  # Bỏ cột quyết định
+        "conditions": conditions,
+        "decisions": decisions,
+        "decision_values": list(pd.factorize(data[data.columns[-1]])[1]),
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+        "hits": 0,
+        "misses": 0,
+    }
+
+
+def subset_partition(engine: RoughSetEngine, attrs: Iterable[str]) -> np.ndarray:
+    # Mã khối của từng dòng trong phân hoạch IND(attrs). Khi chưa có trong bộ đệm, bắt đầu từ tập con lớn nhất đã
+    # lưu (thường là attrs bớt một thuộc tính) và chỉ tinh chỉnh thêm các cột còn thiếu
+    key = frozenset(engine["attributes"].index(attr) for attr in attrs)
+    cache = engine["cache"]
+    if key in cache:
+        engine["hits"] += 1
+        cache.move_to_end(key)
+        return cache[key]
+
+    engine["misses"] += 1
+    base = max((subset for subset in cache if subset < key), key=len, default=frozenset())
+    blocks = cache[base] if base else np.zeros(len(engine["decisions"]), dtype=np.int64)
+    for a in sorted(key - base):
+        blocks = refine_partition(blocks, engine["conditions"][:, a])
+    cache[key] = blocks
+    if len(cache) > engine["cache_size"]:
+        cache.popitem(last=False)
+    return blocks
+
+
+def decision_class(engine: RoughSetEngine, value) -> np.ndarray:
+    # Tập mục tiêu X = các dòng có quyết định bằng value (mảng bool)
+    return engine["decisions"] == engine["decision_values"].index(value)
+
+
+def approximations(engine: RoughSetEngine, attrs: Iterable[str], target: np.ndarray) -> Dict[str, np.ndarray]:
+    # Xấp xỉ dưới (khối nằm trọn trong X), xấp xỉ trên (khối giao X khác rỗng) và miền biên của tập dòng target
+    blocks = subset_partition(engine, attrs)
+    sizes = np.bincount(blocks)
+    inside = np.bincount(blocks, weights=target.astype(float), minlength=len(sizes))
+    lower = (inside == sizes)[blocks]
+    upper = (inside > 0)[blocks]
+    return {"lower": lower, "upper": upper, "boundary": upper & ~lower}
+
+
+def dependency_degree(engine: RoughSetEngine, attrs: Iterable[str]) -> float:
+    # γ(attrs) = |POS_attrs(D)| / n
+    decisions = engine["decisions"]
+    if len(decisions) == 0:
+        return 0.0
+    return float(positive_region(subset_partition(engine, attrs), decisions).mean())
+
+
+def quick_reduct(data: pd.DataFrame, core: Set[str] = None) -> Set[str]:
+    # QuickReduct: bắt đầu từ lõi (nếu có), mỗi bước thêm thuộc tính làm độ phụ thuộc γ = |POS| / n tăng nhiều nhất
+    # cho tới khi bằng γ của toàn bộ thuộc tính điều kiện, rồi bỏ các thuộc tính thừa để được một rút gọn tối tiểu.
+    # Lõi chỉ là điểm xuất phát: với bảng không nhất quán, lõi từ ma trận phân biệt (compute_core) có thể chứa thuộc
+    # tính không cần cho γ, nên bước loại bỏ xét cả thuộc tính của lõi.
+    # Dòng đã vào miền dương không bao giờ rời đi khi thêm thuộc tính, nên mỗi bước chỉ tinh chỉnh phân hoạch của
+    # các dòng còn lại: O(số thuộc tính x số dòng chưa thuộc miền dương) mỗi bước
+    engine = create_rough_set_engine(data)
+    attributes = engine["attributes"]
+    conditions, decisions = engine["conditions"], engine["decisions"]
+    n, m = conditions.shape
+    target = dependency_degree(engine, attributes)
+
+    selected = [attributes.index(attr) for attr in attributes if core and attr in core]
+    blocks = np.zeros(n, dtype=np.int64)
+    for a in selected:
+        blocks = refine_partition(blocks, conditions[:, a])
+    active = ~positive_region(blocks, decisions)
+    covered = n - int(active.sum())
+
+    while covered < round(target * n):
+        active_blocks = blocks[active]
+        active_decisions = decisions[active]
+        best = None
+        for a in range(m):
+            if a in selected:
+                continue
+            refined = refine_partition(active_blocks, conditions[active, a])
+            gain = int(positive_region(refined, active_decisions).sum())
+            # Cùng mức tăng γ thì ưu tiên thuộc tính tách được nhiều khối hơn
+            score = (gain, refined.max() + 1)
+            if best is None or score > best[0]:
+                best = (score, a, refined)
+        _, a, refined = best
+        selected.append(a)
+        rows = np.flatnonzero(active)
+        blocks[rows] = refined + blocks.max() + 1
+        blocks = pd.factorize(blocks)[0].astype(np.int64)
+        newly_positive = positive_region(refined, active_decisions)
+        active[rows[newly_positive]] = False
+        covered += int(newly_positive.sum())
+
+    # Loại bỏ thuộc tính thừa, xét từ thuộc tính được thêm sau cùng
+    for a in reversed(selected[:]):
+        rest = [b for b in selected if b != a]
+        if dependency_degree(engine, [attributes[b] for b in rest]) == target:
+            selected = rest
+
+    return {attributes[a] for a in sorted(selected)}
+
+
+# Cách tìm rút gọn: tất cả rút gọn (tập chặn tối tiểu) hoặc một rút gọn theo heuristic QuickReduct cho bảng nhiều cột
+REDUCTION_METHODS = ["Tất cả rút gọn", "QuickReduct (heuristic)"]
+
+
+def rough_set_reduction(data: pd.DataFrame, method: str = "Tất cả rút gọn",
+                        discernibility_matrix: DiscernibilityMatrix = None) -> List[Set[str]]:
+    # discernibility_matrix: ma trận đã dựng sẵn (generate_reduced_discernibility_matrix) để không phải dựng lại
+    if method == "QuickReduct (heuristic)":
+        return [quick_reduct(data)]
+    if discernibility_matrix is None:
+        discernibility_matrix = generate_reduced_discernibility_matrix(data)
     all_attributes = set(data.columns[:-1])  # Bỏ cột quyết định
     reducts = find_all_reducts(discernibility_matrix, all_attributes)
     return reducts
@@ -61,29 +373,54 @@ def load_file() -> None:
         text_box.insert(tk.END, data.to_string(index=False))
         
         # Thực hiện thuật toán tập thô
-        reducts = rough_set_reduction(data)
+        method = method_var.get()
+        matrix = None
+        if method != "QuickReduct (heuristic)":
+            matrix = generate_reduced_discernibility_matrix(data)
+        reducts = rough_set_reduction(data, method, matrix)
 
-        # Hiển thị tất cả các tập rút gọn
-        text_box.insert(tk.END, "\n\nTất cả các tập rút gọn:\n")
+        # Hiển thị lõi (chỉ khi đã dựng ma trận phân biệt) và các tập rút gọn
+        if matrix is not None:
+            core = compute_core(matrix)
+            text_box.insert(tk.END, f"\n\nLõi: {', '.join(sorted(core)) if core else '(rỗng)'}")
+        text_box.insert(tk.END, "\n\nTất cả các tập rút gọn:\n" if method != "QuickReduct (heuristic)"
+                        else "\n\nTập rút gọn (QuickReduct):\n")
         for i, reduct in enumerate(reducts, start=1):
             text_box.insert(tk.END, f"Rút gọn {i}: {', '.join(reduct)}\n")
+
+        # Xấp xỉ dưới / trên và miền biên của từng lớp quyết định theo rút gọn đầu tiên (số thứ tự dòng từ 1)
+        if reducts:
+            engine = create_rough_set_engine(data)
+            attrs = sorted(reducts[0], key=engine["attributes"].index)
+            text_box.insert(tk.END, f"\nĐộ phụ thuộc γ({', '.join(attrs)}) = {dependency_degree(engine, attrs):.4f}\n")
+            for value in engine["decision_values"]:
+                regions = approximations(engine, attrs, decision_class(engine, value))
+                text_box.insert(tk.END, f"Lớp {value}: xấp xỉ dưới {(np.flatnonzero(regions['lower']) + 1).tolist()}, "
+                                        f"xấp xỉ trên {(np.flatnonzero(regions['upper']) + 1).tolist()}, "
+                                        f"miền biên {(np.flatnonzero(regions['boundary']) + 1).tolist()}\n")
     except Exception as e:
         messagebox.showerror("Lỗi", f"Không thể xử lý file: {e}")
 
 
-# Tạo giao diện Tkinter
-root: tk.Tk = tk.Tk()
-root.title("Thuật toán tập thô")
-root.geometry("500x400")
-root.configure(bg="#1C2833")
+if __name__ == "__main__":
+    # Tạo giao diện Tkinter
+    root: tk.Tk = tk.Tk()
+    root.title("Thuật toán tập thô")
+    root.geometry("500x400")
+    root.configure(bg="#1C2833")
+
+    # Nút tải file
+    load_button: tk.Button = tk.Button(root, text="Tải file Excel", command=load_file, width=20, bg="#2E4053", fg="white", font=("Cambria", 12))
+    load_button.pack(pady=10)
 
-# Nút tải file
-load_button: tk.Button = tk.Button(root, text="Tải file Excel", command=load_file, width=20, bg="#2E4053", fg="white", font=("Cambria", 12))
-load_button.pack(pady=10)
+    # Chọn cách tìm rút gọn
+    method_var: tk.StringVar = tk.StringVar(value=REDUCTION_METHODS[0])
+    method_menu: tk.OptionMenu = tk.OptionMenu(root, method_var, *REDUCTION_METHODS)
+    method_menu.pack(pady=5)
 
-# Text box hiển thị kết quả
-text_box: tk.Text = tk.Text(root, wrap=tk.WORD, width=80, height=20, bg="#1C2833", fg="white")
-text_box.pack(padx=10, pady=10)
+    # Text box hiển thị kết quả
+    text_box: tk.Text = tk.Text(root, wrap=tk.WORD, width=80, height=20, bg="#1C2833", fg="white")
+    text_box.pack(padx=10, pady=10)
 
-# Bắt đầu chương trình
-root.mainloop()
+    # Bắt đầu chương trình
+    root.mainloop()
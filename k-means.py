@@ -1,105 +1,635 @@
+import time
 import numpy as np
 import pandas as pd
 import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import ttk, filedialog
+from Clustering_Common import (MAX_LISTED_SAMPLES, create_reporter, report, dump, close_reporter, feature_statistics,
+                               create_model, save_model, assign)
 
-def initialize_partition_matrix(n_samples: int, n_clusters: int):
+def initialize_labels(n_samples: int, n_clusters: int):
     """
-    Khởi tạo ma trận phân hoạch dạng ma trận chéo, với các đường chéo là 1.
-    Nếu số cụm nhỏ hơn số mẫu, các hàng còn lại sẽ có giá trị 1.
+    Khởi tạo phân hoạch ban đầu dạng vector nhãn: mẫu i (i < số cụm) thuộc cụm i,
+    các mẫu còn lại thuộc cụm cuối cùng.
     """
-    partition_matrix = np.zeros((n_samples, n_clusters))
-    for i in range(min(n_samples, n_clusters)):
-        partition_matrix[i, i] = 1
-    # Các hàng còn lại sẽ gán 1 cho cụm cuối cùng
-    if n_samples > n_clusters:
-        for i in range(n_clusters, n_samples):
-            partition_matrix[i, -1] = 1
-    return partition_matrix
+    return np.minimum(np.arange(n_samples), n_clusters - 1)
 
-def calculate_centroids(data: np.ndarray, partition_matrix: np.ndarray):
+def calculate_centroids(data: np.ndarray, labels: np.ndarray, n_clusters: int, chunk_size: int = 65536):
     """
-    Tính vector trọng tâm từ ma trận phân hoạch.
+    Tính vector trọng tâm (mỗi hàng là một cụm) từ vector nhãn bằng một lượt cộng dồn theo nhãn (theo khối hàng).
+    Cụm rỗng có trọng tâm bằng 0.
     """
-    n_attrs = data.shape[1]
-    n_clusters = partition_matrix.shape[1]
-    centroids = np.zeros((n_attrs, n_clusters))
-
-    for j in range(n_clusters):
-        indices = np.where(partition_matrix[:, j] == 1)[0]
-        if len(indices) > 0:
-            centroids[:, j] = np.mean(data[indices], axis=0)
+    sums = np.zeros((n_clusters, data.shape[1]))
+    for start in range(0, data.shape[0], chunk_size):
+        np.add.at(sums, labels[start:start + chunk_size], data[start:start + chunk_size])
+    counts = np.bincount(labels, minlength=n_clusters)
+    centroids = np.zeros_like(sums)
+    non_empty = counts > 0
+    centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
     return centroids
 
-def calculate_partition_matrix(data: np.ndarray, centroids: np.ndarray):
+def mean_feature_variance(data: np.ndarray, chunk_size: int = 65536):
+    """
+    Phương sai trung bình của các thuộc tính, cộng dồn tổng và tổng bình phương theo khối hàng.
+    """
+    total = np.zeros(data.shape[1])
+    total_squares = np.zeros(data.shape[1])
+    for start in range(0, data.shape[0], chunk_size):
+        block = np.asarray(data[start:start + chunk_size], dtype=float)
+        total += block.sum(axis=0)
+        total_squares += np.einsum("ij,ij->j", block, block)
+    mean = total / data.shape[0]
+    return float(np.mean(np.maximum(total_squares / data.shape[0] - mean ** 2, 0.0)))
+
+def calculate_labels(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536, return_distances: bool = False):
+    """
+    Gán mỗi mẫu vào cụm có trọng tâm gần nhất (khoảng cách Euclidean).
+    Khoảng cách bình phương được tính theo khối hàng: ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2,
+    bỏ ||x||^2 vì không ảnh hưởng đến argmin.
+    return_distances=True trả thêm bình phương khoảng cách tới trọng tâm được gán (tổng của nó là inertia).
     """
-    Tính ma trận phân hoạch dựa trên khoảng cách Euclidean giữa dữ liệu và các vector trọng tâm.
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(data.shape[0], dtype=np.int64)
+    nearest = np.empty(data.shape[0]) if return_distances else None
+    for start in range(0, data.shape[0], chunk_size):
+        block = data[start:start + chunk_size]
+        distances = centroid_norms - 2.0 * block @ centroids.T
+        block_labels = np.argmin(distances, axis=1)
+        labels[start:start + chunk_size] = block_labels
+        if return_distances:
+            nearest[start:start + chunk_size] = np.maximum(
+                distances[np.arange(len(block)), block_labels] + np.einsum("ij,ij->i", block, block), 0.0)
+    return (labels, nearest) if return_distances else labels
+
+def calculate_inertia(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536):
     """
+    Tổng bình phương khoảng cách từ mỗi mẫu đến trọng tâm gần nhất, tính theo khối hàng.
+    """
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    inertia = 0.0
+    for start in range(0, data.shape[0], chunk_size):
+        block = data[start:start + chunk_size]
+        distances = centroid_norms - 2.0 * block @ centroids.T
+        inertia += float(np.einsum("ij,ij->", block, block) + distances.min(axis=1).sum())
+    return max(inertia, 0.0)
+
+def minibatch_kmeans(data: np.ndarray, n_clusters: int, batch_size: int = 1024, max_iter: int = 300,
+                     holdout_size: int = 10000, tol: float = 1e-4, patience: int = 10, seed: int = 42,
+                     init: str = None, init_size: int = None):
+    """
+    K-means theo lô nhỏ: mỗi vòng chỉ lấy ngẫu nhiên batch_size mẫu, gán cụm rồi kéo trọng tâm về phía trung bình
+    của lô với tốc độ học riêng cho từng cụm = (số mẫu của cụm trong lô) / (tổng số mẫu cụm đã nhận).
+    Hội tụ được theo dõi bằng inertia trung bình trên một tập mẫu giữ lại (không dùng để huấn luyện):
+    dừng khi inertia (làm trơn) không giảm quá tol (tương đối) trong patience vòng liên tiếp.
+    init: phương pháp của initialize_centroids áp dụng trên init_size mẫu huấn luyện lấy ngẫu nhiên
+    (mặc định 3 * batch_size) để bộ nhớ khởi tạo không phụ thuộc kích thước dữ liệu;
+    None = chọn ngẫu nhiên n_clusters mẫu huấn luyện làm trọng tâm.
+    Trả về (trọng tâm, vector nhãn của toàn bộ dữ liệu, lịch sử từng vòng). Mỗi vòng có các trường như run_kmeans
+    (iteration, inertia, shift, changed, time), trong đó inertia là ước lượng cho toàn bộ dữ liệu
+    (= holdout_inertia * số mẫu) và changed là số mẫu của tập giữ lại đổi cụm; thêm holdout_inertia
+    (inertia trung bình mỗi mẫu trên tập giữ lại).
+    """
+    rng = np.random.default_rng(seed)
     n_samples = data.shape[0]
-    n_clusters = centroids.shape[1]
-    partition_matrix = np.zeros((n_samples, n_clusters))
+    permutation = rng.permutation(n_samples)
+    if n_clusters > n_samples:
+        raise ValueError(f"Số cụm ({n_clusters}) lớn hơn số mẫu ({n_samples}).")
+    # Tập giữ lại không lấy quá nửa dữ liệu và luôn chừa đủ n_clusters mẫu huấn luyện để khởi tạo trọng tâm
+    n_holdout = max(0, min(holdout_size, n_samples // 2, n_samples - n_clusters))
+    holdout = data[np.sort(permutation[:n_holdout])] if n_holdout > 0 else data
+    train_indices = permutation[n_holdout:]
 
-    for i in range(n_samples):
-        distances = [np.linalg.norm(data[i] - centroids[:, j]) for j in range(n_clusters)]
-        min_index = np.argmin(distances)
-        partition_matrix[i, min_index] = 1  # Gán vào cụm có khoảng cách nhỏ nhất
+    if init is None:
+        centroids = data[np.sort(rng.choice(train_indices, size=n_clusters, replace=False))].astype(float)
+    else:
+        init_size = min(len(train_indices), max(3 * batch_size if init_size is None else init_size, n_clusters))
+        sample = data[np.sort(rng.choice(train_indices, size=init_size, replace=False))]
+        centroids = initialize_centroids(sample, n_clusters, init, seed).astype(float)
+    counts = np.zeros(n_clusters)
+    history = []
+    best = np.inf
+    smoothed = None
+    no_improvement = 0
+    holdout_labels = None
 
-    return partition_matrix
+    for iteration in range(1, max_iter + 1):
+        started = time.perf_counter()
+        previous = centroids.copy()
+        batch = data[np.sort(rng.choice(train_indices, size=min(batch_size, len(train_indices)), replace=False))]
+        batch_labels = calculate_labels(batch, centroids)
+        batch_counts = np.bincount(batch_labels, minlength=n_clusters)
+        batch_sums = np.zeros_like(centroids)
+        np.add.at(batch_sums, batch_labels, batch)
 
-def kohonen_algorithm(data: pd.DataFrame, n_clusters: int, learning_rate: float, epochs: int, text_box):
-    np.random.seed(42)
-    
-    # Tách nhãn và vector thuộc tính
-    labels = data.iloc[:, 0]  # Cột đầu tiên là nhãn
-    input_vectors = data.iloc[:, 1:].values  # Các cột còn lại là vector thuộc tính
-    n_samples, n_attrs = input_vectors.shape
+        # Cập nhật trọng tâm với tốc độ học riêng của từng cụm
+        counts += batch_counts
+        updated = batch_counts > 0
+        eta = batch_counts[updated] / counts[updated]
+        centroids[updated] += eta[:, None] * (batch_sums[updated] / batch_counts[updated, None] - centroids[updated])
 
-    # Khởi tạo ma trận phân hoạch ban đầu
-    partition_matrix = initialize_partition_matrix(n_samples, n_clusters)
-    text_box.insert(tk.END, "Bước 0 - Ma trận phân hoạch khởi tạo:\n")
-    text_box.insert(tk.END, f"{partition_matrix}\n")
+        # Theo dõi hội tụ trên tập giữ lại
+        new_labels, distances = calculate_labels(holdout, centroids, return_distances=True)
+        inertia = float(distances.sum()) / len(holdout)
+        changed = len(holdout) if holdout_labels is None else int((new_labels != holdout_labels).sum())
+        holdout_labels = new_labels
+        history.append({"iteration": iteration, "inertia": inertia * n_samples,
+                        "shift": float(((centroids - previous) ** 2).sum()), "changed": changed,
+                        "time": time.perf_counter() - started, "holdout_inertia": inertia})
+        smoothed = inertia if smoothed is None else 0.7 * smoothed + 0.3 * inertia
+        if smoothed < best * (1 - tol):
+            best = smoothed
+            no_improvement = 0
+        else:
+            no_improvement += 1
+            if no_improvement >= patience:
+                break
 
-    # Tính vector trọng tâm ban đầu
-    weights = calculate_centroids(input_vectors, partition_matrix)
-    text_box.insert(tk.END, "Bước 0 - Vector trọng tâm khởi tạo:\n")
-    text_box.insert(tk.END, f"{weights}\n")
+    return centroids, calculate_labels(data, centroids), history
 
-    # Bán kính cố định là 0
-    radius = 0.0
+def squared_distances_to_nearest(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536):
+    """
+    Bình phương khoảng cách từ mỗi mẫu tới trọng tâm gần nhất trong centroids, tính theo khối hàng.
+    """
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    distances = np.empty(data.shape[0])
+    for start in range(0, data.shape[0], chunk_size):
+        block = data[start:start + chunk_size]
+        partial = centroid_norms - 2.0 * block @ centroids.T
+        distances[start:start + chunk_size] = np.maximum(partial.min(axis=1) + np.einsum("ij,ij->i", block, block), 0.0)
+    return distances
+
+def kmeans_plus_plus(data: np.ndarray, n_clusters: int, rng: np.random.Generator, weights: np.ndarray = None):
+    """
+    Khởi tạo k-means++: chọn trọng tâm đầu ngẫu nhiên, mỗi trọng tâm tiếp theo được chọn với xác suất tỉ lệ
+    với bình phương khoảng cách tới trọng tâm gần nhất đã chọn (nhân trọng số mẫu nếu có).
+    """
+    weights = np.ones(data.shape[0]) if weights is None else weights
+    centroids = np.empty((n_clusters, data.shape[1]))
+    centroids[0] = data[rng.choice(data.shape[0], p=weights / weights.sum())]
+    distances = squared_distances_to_nearest(data, centroids[:1])
+    for j in range(1, n_clusters):
+        scores = distances * weights
+        total = scores.sum()
+        index = rng.choice(data.shape[0], p=scores / total) if total > 0 else rng.integers(data.shape[0])
+        centroids[j] = data[index]
+        distances = np.minimum(distances, squared_distances_to_nearest(data, centroids[j:j + 1]))
+    return centroids
 
-    # Lặp qua các epoch
-    for epoch in range(epochs):
-        text_box.insert(tk.END, f"\nEpoch {epoch + 1}:\n")
+def kmeans_parallel_init(data: np.ndarray, n_clusters: int, rng: np.random.Generator, rounds: int = 5,
+                         oversampling: float = None):
+    """
+    Khởi tạo k-means|| : qua vài vòng, mỗi vòng lấy độc lập mỗi mẫu với xác suất oversampling * d^2(x) / tổng d^2
+    (mặc định oversampling = 2 * số cụm), sau đó gom các ứng viên về đúng số cụm bằng k-means++ có trọng số
+    (trọng số = số mẫu gần ứng viên nhất) và vài vòng k-means có trọng số trên tập ứng viên.
+    """
+    oversampling = 2 * n_clusters if oversampling is None else oversampling
+    candidates = data[rng.integers(data.shape[0])][None, :]
+    distances = squared_distances_to_nearest(data, candidates)
+    for _ in range(rounds):
+        total = distances.sum()
+        if total <= 0:
+            break
+        chosen = np.flatnonzero(rng.random(data.shape[0]) < oversampling * distances / total)
+        if len(chosen) == 0:
+            continue
+        candidates = np.vstack([candidates, data[chosen]])
+        distances = np.minimum(distances, squared_distances_to_nearest(data, data[chosen]))
 
-        # Tính ma trận phân hoạch mới
-        partition_matrix = calculate_partition_matrix(input_vectors, weights)
-        text_box.insert(tk.END, f"Ma trận phân hoạch:\n{partition_matrix}\n")
+    if len(candidates) <= n_clusters:
+        extra = data[rng.choice(data.shape[0], size=n_clusters - len(candidates), replace=data.shape[0] < n_clusters)]
+        return np.vstack([candidates, extra])
+
+    weights = np.bincount(calculate_labels(data, candidates), minlength=len(candidates)).astype(float)
+    centroids = kmeans_plus_plus(candidates, n_clusters, rng, weights)
+    for _ in range(10):
+        candidate_labels = calculate_labels(candidates, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, candidate_labels, candidates * weights[:, None])
+        cluster_weights = np.bincount(candidate_labels, weights=weights, minlength=n_clusters)
+        non_empty = cluster_weights > 0
+        centroids[non_empty] = sums[non_empty] / cluster_weights[non_empty, None]
+    return centroids
+
+def initialize_centroids(data: np.ndarray, n_clusters: int, init: str = "k-means++", seed: int = 42):
+    """
+    Khởi tạo trọng tâm theo phương pháp init: "first-rows" (phân hoạch khởi tạo ban đầu), "k-means++" hoặc "k-means||".
+    init = None dùng mặc định "first-rows" (mini-batch xử lý None riêng, xem minibatch_kmeans).
+    """
+    if init is None or init == "first-rows":
+        return calculate_centroids(data, initialize_labels(data.shape[0], n_clusters), n_clusters)
+    rng = np.random.default_rng(seed)
+    if init == "k-means++":
+        return kmeans_plus_plus(data, n_clusters, rng)
+    if init == "k-means||":
+        return kmeans_parallel_init(data, n_clusters, rng)
+    raise ValueError(f"Phương pháp khởi tạo không hợp lệ: {init}")
+
+def run_kmeans(data: np.ndarray, centroids: np.ndarray, max_iter: int = 300, tol: float = 1e-4, callback=None):
+    """
+    Lặp gán cụm / cập nhật trọng tâm cho tới khi hội tụ:
+    - không mẫu nào đổi cụm, hoặc
+    - tổng bình phương độ dịch chuyển trọng tâm <= tol * phương sai trung bình của các thuộc tính, hoặc
+    - inertia giảm ít hơn tol (tương đối) so với vòng trước,
+    hoặc khi đạt max_iter. callback(kết quả vòng, vector nhãn, trọng tâm) được gọi sau mỗi vòng nếu có.
+    Trả về dict: centroids, labels, inertia, n_iter, converged, stop_reason và history
+    (mỗi vòng: iteration, inertia, shift, changed, time).
+    """
+    n_clusters = centroids.shape[0]
+    shift_tol = tol * mean_feature_variance(data) if data.shape[0] else 0.0
+    cluster_labels = None
+    history = []
+    stop_reason = "max_iter"
+    for iteration in range(1, max_iter + 1):
+        started = time.perf_counter()
+        new_labels, distances = calculate_labels(data, centroids, return_distances=True)
+        inertia = float(distances.sum())
+        changed = data.shape[0] if cluster_labels is None else int((new_labels != cluster_labels).sum())
+        cluster_labels = new_labels
+        new_centroids = calculate_centroids(data, cluster_labels, n_clusters)
+        shift = float(((new_centroids - centroids) ** 2).sum())
+        centroids = new_centroids
+        history.append({"iteration": iteration, "inertia": inertia, "shift": shift, "changed": changed,
+                        "time": time.perf_counter() - started})
+        if callback is not None:
+            callback(history[-1], cluster_labels, centroids)
+
+        if changed == 0:
+            stop_reason = "labels"
+        elif shift <= shift_tol:
+            stop_reason = "shift"
+        elif len(history) > 1 and history[-2]["inertia"] - inertia <= tol * history[-2]["inertia"]:
+            stop_reason = "inertia"
+        else:
+            continue
+        break
+
+    return {
+        "centroids": centroids,
+        "labels": cluster_labels,
+        "inertia": history[-1]["inertia"] if history else 0.0,
+        "n_iter": len(history),
+        "converged": stop_reason != "max_iter",
+        "stop_reason": stop_reason,
+        "history": history,
+    }
+
+def single_kmeans_run(data: np.ndarray, n_clusters: int, init: str, seed: int, max_iter: int, mode: str = "batch",
+                      batch_size: int = 1024):
+    # Một lần chạy theo đúng chế độ đã chọn; kết quả cùng dạng với run_kmeans (centroids, labels, inertia, ...).
+    # data là đường dẫn file .npy thì mở dạng memmap
+    if isinstance(data, str):
+        data = load_feature_file(data)
+    if mode == "mini-batch":
+        centroids, labels, history = minibatch_kmeans(data, n_clusters, batch_size=batch_size, max_iter=max_iter,
+                                                      seed=seed, init=init)
+        # history cùng dạng với run_kmeans (inertia của từng vòng được ước lượng trên tập giữ lại)
+        return {"centroids": centroids, "labels": labels, "inertia": calculate_inertia(data, centroids),
+                "n_iter": len(history), "converged": len(history) < max_iter,
+                "stop_reason": "inertia" if len(history) < max_iter else "max_iter", "history": history}
+    if mode == "accelerated":
+        return hamerly_kmeans(data, initialize_centroids(data, n_clusters, init, seed), max_iter)
+    return run_kmeans(data, initialize_centroids(data, n_clusters, init, seed), max_iter)
+
+# Dữ liệu của tiến trình con khi chạy n_init song song, được gán một lần khi tiến trình khởi động
+WORKER_DATA = {}
+
+def init_kmeans_worker(data):
+    WORKER_DATA["data"] = load_feature_file(data) if isinstance(data, str) else data
+
+def worker_kmeans_run(n_clusters: int, init: str, seed: int, max_iter: int, mode: str, batch_size: int):
+    return single_kmeans_run(WORKER_DATA["data"], n_clusters, init, seed, max_iter, mode, batch_size)
+
+def kmeans_n_init(data: np.ndarray, n_clusters: int, n_init: int = 10, init: str = "k-means++", max_iter: int = 300,
+                  n_workers: int = None, seed: int = 42, mode: str = "batch", batch_size: int = 1024):
+    """
+    Chạy n_init lần k-means độc lập (mỗi lần một hạt giống khởi tạo khác nhau) song song trên nhiều tiến trình,
+    giữ lời giải có inertia nhỏ nhất (tính trên toàn bộ dữ liệu). mode chọn thuật toán của mỗi lần chạy
+    ("batch", "mini-batch" hoặc "accelerated", xem single_kmeans_run).
+    Dữ liệu chỉ được gửi cho mỗi tiến trình một lần lúc khởi động (initializer), mỗi lần chạy chỉ truyền tham số.
+    data có thể là đường dẫn file .npy: mỗi tiến trình tự mở memmap thay vì nhận bản sao dữ liệu qua pickle.
+    Một np.memmap truyền trực tiếp sẽ bị pickle thành toàn bộ nội dung, nên khi đó các lần chạy được thực hiện
+    tuần tự trong tiến trình hiện tại.
+    Trả về (kết quả tốt nhất, danh sách inertia của từng lần chạy).
+    """
+    seeds = [seed + i for i in range(n_init)]
+    if isinstance(data, np.memmap):
+        n_workers = 1
+    if n_init == 1 or n_workers == 1:
+        results = [single_kmeans_run(data, n_clusters, init, s, max_iter, mode, batch_size) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_kmeans_worker,
+                                 initargs=(data,)) as executor:
+            results = list(executor.map(worker_kmeans_run, [n_clusters] * n_init, [init] * n_init, seeds,
+                                        [max_iter] * n_init, [mode] * n_init, [batch_size] * n_init))
+    inertias = [result["inertia"] for result in results]
+    return results[int(np.argmin(inertias))], inertias
+
+def hamerly_kmeans(data: np.ndarray, centroids: np.ndarray, max_iter: int, tol: float = 1e-4,
+                   chunk_size: int = 65536):
+    """
+    K-means chính xác tăng tốc bằng bất đẳng thức tam giác (Hamerly): mỗi mẫu giữ cận trên u (khoảng cách tới trọng tâm
+    đang gán) và cận dưới l (khoảng cách tới trọng tâm gần thứ hai). Mẫu có u < max(l, s[a]) với s[a] là nửa khoảng cách
+    từ trọng tâm a tới trọng tâm gần nhất khác thì chắc chắn không đổi cụm nên bỏ qua việc tính khoảng cách.
+    Các mẫu còn lại được gán lại bằng đúng công thức của calculate_labels, và điều kiện dừng giống hệt run_kmeans
+    (nhãn, độ dịch chuyển, inertia theo tol) nên kết quả trùng với thuật toán thường.
+    Inertia của mỗi vòng được suy ra từ tổng theo cụm: sum ||x||^2 - 2 sum n_j c_j.m_j + sum n_j ||c_j||^2
+    (m_j là trung bình mới của cụm j), không cần khoảng cách thật của các mẫu bị bỏ qua.
+    Trả về dict cùng dạng với run_kmeans; mỗi vòng của history có các trường như run_kmeans, thêm computed / skipped
+    (số khoảng cách đã tính / bỏ qua).
+    """
+    n_samples, n_clusters = data.shape[0], centroids.shape[0]
+    if n_clusters == 1:
+        # Một cụm: không có trọng tâm thứ hai để lập cận dưới, chạy thẳng thuật toán thường (mỗi vòng n khoảng cách)
+        result = run_kmeans(data, centroids, max_iter, tol)
+        for step in result["history"]:
+            step.update(computed=n_samples, skipped=0)
+        return result
+    shift_tol = tol * mean_feature_variance(data) if n_samples else 0.0
+    data_norms = np.einsum("ij,ij->i", data, data)
+    total_norm = float(data_norms.sum())
 
-        # Cập nhật trọng số (vector trọng tâm)
-        weights = calculate_centroids(input_vectors, partition_matrix)
-        text_box.insert(tk.END, f"Vector trọng tâm:\n{weights}\n")
+    def assign(rows: np.ndarray):
+        # Gán lại các mẫu rows, trả về nhãn, khoảng cách tới trọng tâm gần nhất và gần thứ hai
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        labels = np.empty(len(rows), dtype=np.int64)
+        upper = np.empty(len(rows))
+        lower = np.full(len(rows), np.inf)
+        for start in range(0, len(rows), chunk_size):
+            block_rows = rows[start:start + chunk_size]
+            partial = centroid_norms - 2.0 * data[block_rows] @ centroids.T
+            block_labels = np.argmin(partial, axis=1)
+            squared = np.maximum(partial + data_norms[block_rows, None], 0.0)
+            labels[start:start + chunk_size] = block_labels
+            upper[start:start + chunk_size] = np.sqrt(squared[np.arange(len(block_rows)), block_labels])
+            if n_clusters > 1:
+                squared[np.arange(len(block_rows)), block_labels] = np.inf
+                lower[start:start + chunk_size] = np.sqrt(squared.min(axis=1))
+        return labels, upper, lower
 
-        # Hiển thị thông tin trong epoch
-        text_box.insert(tk.END, f"Tốc độ học: {learning_rate:.4f}, Bán kính: {radius:.4f}\n")
+    started = time.perf_counter()
+    all_rows = np.arange(n_samples)
+    labels, upper, lower = assign(all_rows)
+    history = []
+    computed, changed = n_samples * n_clusters, n_samples
+    stop_reason = "max_iter"
 
-        # Giảm tốc độ học sau mỗi epoch
-        learning_rate /= 2
+    for iteration in range(1, max_iter + 1):
+        # Cập nhật trọng tâm; inertia của nhãn hiện tại so với trọng tâm cũ tính từ tổng theo cụm
+        new_centroids = calculate_centroids(data, labels, n_clusters)
+        counts = np.bincount(labels, minlength=n_clusters)
+        inertia = max(total_norm - 2.0 * float(np.einsum("j,jd,jd->", counts, centroids, new_centroids))
+                      + float(np.einsum("j,jd,jd->", counts, centroids, centroids)), 0.0)
+        shift = np.linalg.norm(new_centroids - centroids, axis=1)
+        centroids = new_centroids
+        history.append({"iteration": iteration, "inertia": inertia, "shift": float((shift ** 2).sum()),
+                        "changed": changed, "time": time.perf_counter() - started,
+                        "computed": computed, "skipped": n_samples * n_clusters - computed})
 
-        # Kiểm tra điều kiện dừng sớm nếu tốc độ học quá nhỏ
-        if learning_rate < 1e-6:
-            text_box.insert(tk.END, "Tốc độ học quá nhỏ, dừng thuật toán sớm.\n")
+        # Cùng điều kiện dừng và thứ tự kiểm tra như run_kmeans
+        if changed == 0:
+            stop_reason = "labels"
+        elif history[-1]["shift"] <= shift_tol:
+            stop_reason = "shift"
+        elif len(history) > 1 and history[-2]["inertia"] - inertia <= tol * history[-2]["inertia"]:
+            stop_reason = "inertia"
+        if stop_reason != "max_iter" or iteration == max_iter:
             break
 
+        # Nới các cận theo độ dịch chuyển của trọng tâm rồi gán lại các mẫu có thể đổi cụm
+        started = time.perf_counter()
+        upper += shift[labels]
+        lower -= shift.max()
+
+        center_distances = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=2)
+        np.fill_diagonal(center_distances, np.inf)
+        half_gap = 0.5 * center_distances.min(axis=1)
+        bound = np.maximum(half_gap[labels], lower)
+        # Biên nhỏ để sai số làm tròn không làm bỏ qua nhầm mẫu sát ranh giới
+        margin = 1e-9 * (1.0 + bound)
+
+        candidates = all_rows[upper >= bound - margin]
+        computed = len(candidates)
+        if len(candidates):
+            # Siết cận trên bằng khoảng cách thật tới trọng tâm đang gán trước khi tính đủ mọi khoảng cách
+            for start in range(0, len(candidates), chunk_size):
+                block_rows = candidates[start:start + chunk_size]
+                upper[block_rows] = np.linalg.norm(data[block_rows] - centroids[labels[block_rows]], axis=1)
+            candidates = candidates[upper[candidates] >= bound[candidates] - margin[candidates]]
+        computed += len(candidates) * n_clusters
+
+        changed = 0
+        if len(candidates):
+            new_labels, upper[candidates], lower[candidates] = assign(candidates)
+            changed = int((new_labels != labels[candidates]).sum())
+            labels[candidates] = new_labels
+
+    return {
+        "centroids": centroids,
+        "labels": labels,
+        "inertia": history[-1]["inertia"] if history else 0.0,
+        "n_iter": len(history),
+        "converged": stop_reason != "max_iter",
+        "stop_reason": stop_reason,
+        "history": history,
+    }
+
+def iter_table_chunks(file_path: str, chunk_size: int = 100000):
+    """
+    Đọc bảng dữ liệu (Excel hoặc CSV) theo từng khối hàng mà không nạp cả file vào bộ nhớ.
+    """
+    if file_path.lower().endswith(".csv"):
+        yield from pd.read_csv(file_path, chunksize=chunk_size)
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def convert_to_feature_file(source_path: str, target_path: str, chunk_size: int = 100000, dtype=np.float64):
+    """
+    Chuyển một lần file Excel/CSV (cột đầu là nhãn, các cột còn lại là thuộc tính) sang file .npy để đọc bằng memmap.
+    Nhãn được ghi ra file văn bản target_path + ".labels.txt", mỗi dòng một nhãn.
+    Đọc hai lượt theo khối: lượt đầu đếm số hàng, lượt sau ghi thẳng vào file .npy.
+    """
+    n_samples = 0
+    n_attrs = None
+    for chunk in iter_table_chunks(source_path, chunk_size):
+        n_samples += len(chunk)
+        n_attrs = chunk.shape[1] - 1
+    if not n_samples:
+        raise ValueError("File không có dữ liệu.")
+
+    features = np.lib.format.open_memmap(target_path, mode="w+", dtype=dtype, shape=(n_samples, n_attrs))
+    start = 0
+    with open(target_path + ".labels.txt", "w", encoding="utf-8") as label_file:
+        for chunk in iter_table_chunks(source_path, chunk_size):
+            features[start:start + len(chunk)] = chunk.iloc[:, 1:].to_numpy(dtype=dtype)
+            label_file.writelines(f"{label}\n" for label in chunk.iloc[:, 0])
+            start += len(chunk)
+    features.flush()
+    del features
+    return target_path
+
+def load_feature_file(path: str):
+    """
+    Mở file thuộc tính .npy ở chế độ memmap (chỉ đọc): dữ liệu được đọc theo khối khi cần, không nạp cả vào bộ nhớ.
+    """
+    return np.load(path, mmap_mode="r")
+
+def assign_file(model, source_path: str, target_path: str, chunk_size: int = 100000):
+    """
+    Chấm điểm một file Excel/CSV (cột đầu là nhãn) theo khối và ghi ra CSV gồm nhãn và số thứ tự cụm (từ 1).
+    Trả về số mẫu đã gán.
+    """
+    n_samples = 0
+    with open(target_path, "w", encoding="utf-8", newline="") as target:
+        for i, chunk in enumerate(iter_table_chunks(source_path, chunk_size)):
+            cluster_labels = assign(model, chunk.iloc[:, 1:].to_numpy(dtype=float), chunk_size)
+            pd.DataFrame({chunk.columns[0]: chunk.iloc[:, 0].to_numpy(), "Cụm": cluster_labels + 1}).to_csv(
+                target, header=i == 0, index=False)
+            n_samples += len(chunk)
+    return n_samples
+
+def format_cluster_sizes(cluster_labels: np.ndarray, n_clusters: int):
+    sizes = np.bincount(cluster_labels, minlength=n_clusters)
+    if n_clusters <= 20:
+        return str(sizes.tolist())
+    return f"nhỏ nhất {sizes.min()}, lớn nhất {sizes.max()}, {int((sizes == 0).sum())} cụm rỗng"
+
+def show_clusters(labels: pd.Series, cluster_labels: np.ndarray, n_clusters: int, reporter):
     # Hiển thị kết quả cụm cuối cùng
-    text_box.insert(tk.END, "\nKết quả phân cụm cuối cùng:\n")
+    report(reporter, "\nKết quả phân cụm cuối cùng:", level=0)
+    if labels is None or len(labels) > MAX_LISTED_SAMPLES:
+        # Dữ liệu lớn: chỉ hiển thị kích thước cụm, danh sách đầy đủ ghi ra file nếu có yêu cầu
+        for cluster_idx, size in enumerate(np.bincount(cluster_labels, minlength=n_clusters)):
+            report(reporter, f"Cụm {cluster_idx + 1}: {size} mẫu", level=0)
+        dump(reporter, "Nhãn cụm cuối cùng:", cluster_labels)
+        return
     clusters = {i: [] for i in range(n_clusters)}
-    for i, row in enumerate(partition_matrix):
-        cluster_idx = np.argmax(row)
+    for i, cluster_idx in enumerate(cluster_labels):
         clusters[cluster_idx].append(labels.iloc[i])
 
     for cluster_idx, items in clusters.items():
         if items:
-            text_box.insert(tk.END, f"Cụm {cluster_idx + 1}: {', '.join(map(str, items))}\n")
+            report(reporter, f"Cụm {cluster_idx + 1}: {', '.join(map(str, items))}", level=0)
+
+def kohonen_algorithm(data, n_clusters: int, max_iter: int, text_box, mode: str = "batch",
+                      batch_size: int = 1024, init: str = None, n_init: int = 1, tol: float = 1e-4,
+                      verbosity: int = 1, dump_path: str = None, standardize: bool = False):
+    """
+    Trả về mô hình đã huấn luyện (create_model) để lưu bằng save_model; nạp lại và gán cụm
+    dữ liệu mới bằng load_model / assign của Clustering_Common (hoặc assign_file).
+    init = None dùng khởi tạo mặc định của từng chế độ: "first-rows" với batch / accelerated,
+    chọn ngẫu nhiên các mẫu huấn luyện với mini-batch.
+    standardize = True: chuẩn hóa từng thuộc tính về trung bình 0, độ lệch chuẩn 1 trước khi phân cụm
+    (chỉ với DataFrame; tham số chuẩn hóa được lưu trong mô hình).
+    """
+    np.random.seed(42)
+    reporter = create_reporter(text_box, verbosity, dump_path)
+    try:
+        return run_with_reporter(data, n_clusters, max_iter, reporter, mode, batch_size, init, n_init, tol,
+                                 standardize)
+    finally:
+        close_reporter(reporter)
+
+def run_with_reporter(data, n_clusters: int, max_iter: int, reporter, mode: str, batch_size: int, init: str,
+                      n_init: int, tol: float, standardize: bool = False):
+    # Tách nhãn và vector thuộc tính; data là đường dẫn file .npy thì đọc dạng memmap theo khối
+    if isinstance(data, str):
+        if standardize:
+            raise ValueError("Chuẩn hóa chỉ hỗ trợ dữ liệu trong bộ nhớ, không hỗ trợ file memmap.")
+        labels = None
+        feature_names = None
+        input_vectors = load_feature_file(data)
+    else:
+        labels = data.iloc[:, 0]  # Cột đầu tiên là nhãn
+        feature_names = [str(name) for name in data.columns[1:]]
+        input_vectors = data.iloc[:, 1:].values.astype(float)  # Các cột còn lại là vector thuộc tính
+    n_samples, n_attrs = input_vectors.shape
+    report(reporter, f"{n_samples} mẫu, {n_attrs} thuộc tính, {n_clusters} cụm", level=0)
+
+    feature_mean = feature_scale = None
+    if standardize:
+        feature_mean, feature_scale = feature_statistics(input_vectors)
+        input_vectors = (input_vectors - feature_mean) / feature_scale
+
+    def finish(weights, cluster_labels, **metadata):
+        show_clusters(labels, cluster_labels, n_clusters, reporter)
+        return create_model(weights, feature_mean, feature_scale, algorithm="k-means", mode=mode,
+                            n_clusters=n_clusters, n_samples=n_samples, feature_names=feature_names,
+                            created=time.strftime("%Y-%m-%d %H:%M:%S"), **metadata)
+
+    if n_init > 1:
+        # Với file .npy chỉ gửi đường dẫn cho các tiến trình con, mỗi tiến trình tự mở memmap
+        source = data if isinstance(data, str) else input_vectors
+        result, inertias = kmeans_n_init(source, n_clusters, n_init, init, max_iter, mode=mode,
+                                         batch_size=batch_size)
+        report(reporter, f"{n_init} lần khởi tạo ({init or 'mặc định'}, chế độ {mode}), "
+                         f"inertia: {', '.join(f'{i:.4f}' for i in inertias)}")
+        report(reporter, f"Chọn lời giải có inertia nhỏ nhất: {result['inertia']:.4f} "
+                         f"({result['n_iter']} vòng, dừng do {result['stop_reason']})", level=0)
+        report(reporter, f"Kích thước cụm: {format_cluster_sizes(result['labels'], n_clusters)}")
+        dump(reporter, "Vector trọng tâm:", result["centroids"])
+        return finish(result["centroids"], result["labels"], init=init, n_init=n_init, inertia=result["inertia"])
+
+    if mode == "mini-batch":
+        weights, cluster_labels, history = minibatch_kmeans(input_vectors, n_clusters, batch_size=batch_size,
+                                                            init=init)
+        report(reporter, f"Mini-batch k-means: {len(history)} vòng, kích thước lô {batch_size}", level=0)
+        for step in history:
+            report(reporter, f"Epoch {step['iteration']}: inertia trên tập giữ lại {step['holdout_inertia']:.4f}, "
+                             f"dịch chuyển trọng tâm {step['shift']:.6f}, {step['changed']} mẫu giữ lại đổi cụm, "
+                             f"{step['time'] * 1000:.2f} ms")
+        report(reporter, f"Kích thước cụm: {format_cluster_sizes(cluster_labels, n_clusters)}")
+        dump(reporter, "Vector trọng tâm:", weights)
+        return finish(weights, cluster_labels, init=init)
+
+    if mode == "accelerated":
+        weights = initialize_centroids(input_vectors, n_clusters, init)
+        result = hamerly_kmeans(input_vectors, weights, max_iter, tol)
+        for step in result["history"]:
+            report(reporter, f"Epoch {step['iteration']}: inertia {step['inertia']:.4f}, "
+                             f"tính {step['computed']} khoảng cách, bỏ qua {step['skipped']}, "
+                             f"{step['changed']} mẫu đổi cụm")
+        if result["converged"]:
+            report(reporter, f"Hội tụ sau {result['n_iter']} vòng (điều kiện: {result['stop_reason']}).", level=0)
+        else:
+            report(reporter, f"Chưa hội tụ sau {max_iter} vòng.", level=0)
+        report(reporter, f"Kích thước cụm: {format_cluster_sizes(result['labels'], n_clusters)}")
+        dump(reporter, "Vector trọng tâm:", result["centroids"])
+        return finish(result["centroids"], result["labels"], init=init, inertia=result["inertia"])
+
+    # Khởi tạo trọng tâm ban đầu
+    weights = initialize_centroids(input_vectors, n_clusters, init)
+    dump(reporter, "Bước 0 - Vector trọng tâm khởi tạo:", weights)
+
+    # Lặp tới khi hội tụ, tóm tắt từng vòng; nhãn/trọng tâm đầy đủ chỉ ghi ra file khi được yêu cầu
+    def show_iteration(step, cluster_labels, weights):
+        report(reporter, f"Epoch {step['iteration']}: inertia {step['inertia']:.4f}, "
+                         f"dịch chuyển trọng tâm {step['shift']:.6f}, {step['changed']} mẫu đổi cụm, "
+                         f"kích thước cụm {format_cluster_sizes(cluster_labels, n_clusters)}, "
+                         f"{step['time'] * 1000:.2f} ms (tổng {time.perf_counter() - reporter['start']:.2f} s)")
+        dump(reporter, f"Epoch {step['iteration']} - nhãn cụm:", cluster_labels)
+        dump(reporter, f"Epoch {step['iteration']} - vector trọng tâm:", weights)
+
+    result = run_kmeans(input_vectors, weights, max_iter, tol, callback=show_iteration)
+    if result["converged"]:
+        report(reporter, f"Hội tụ sau {result['n_iter']} vòng (điều kiện: {result['stop_reason']}).", level=0)
+    else:
+        report(reporter, f"Chưa hội tụ sau {max_iter} vòng.", level=0)
+
+    return finish(result["centroids"], result["labels"], init=init, inertia=result["inertia"])
 
 def run_kohonen():
     # Tạo giao diện tkinter
@@ -120,10 +650,47 @@ def run_kohonen():
     cluster_entry = tk.Entry(input_frame, width=5)
     cluster_entry.pack(side=tk.LEFT, padx=5)
 
+    # Chế độ chạy: k-means theo lô đầy đủ, theo lô nhỏ hoặc tăng tốc bằng bất đẳng thức tam giác
+    tk.Label(input_frame, text="Chế độ:").pack(side=tk.LEFT)
+    mode_box = ttk.Combobox(input_frame, values=["batch", "mini-batch", "accelerated"], width=10, state="readonly")
+    mode_box.current(0)
+    mode_box.pack(side=tk.LEFT, padx=5)
+    tk.Label(input_frame, text="Kích thước lô:").pack(side=tk.LEFT)
+    batch_entry = tk.Entry(input_frame, width=6)
+    batch_entry.insert(0, "1024")
+    batch_entry.pack(side=tk.LEFT, padx=5)
+
+    # Phương pháp khởi tạo trọng tâm và số lần khởi tạo lại (chạy song song, giữ lời giải tốt nhất)
+    init_frame = tk.Frame(root)
+    init_frame.pack(pady=5)
+    tk.Label(init_frame, text="Khởi tạo:").pack(side=tk.LEFT)
+    # "mặc định": first-rows với batch / accelerated, mẫu ngẫu nhiên với mini-batch
+    init_box = ttk.Combobox(init_frame, values=["mặc định", "first-rows", "k-means++", "k-means||"], width=10,
+                            state="readonly")
+    init_box.current(0)
+    init_box.pack(side=tk.LEFT, padx=5)
+    tk.Label(init_frame, text="Số lần khởi tạo (n_init):").pack(side=tk.LEFT)
+    n_init_entry = tk.Entry(init_frame, width=4)
+    n_init_entry.insert(0, "1")
+    n_init_entry.pack(side=tk.LEFT, padx=5)
+
+    # Mức chi tiết của tiến trình: 0 = chỉ kết quả, 1 = tóm tắt từng vòng, 2 = thêm ghi ma trận đầy đủ ra file
+    tk.Label(init_frame, text="Chi tiết:").pack(side=tk.LEFT)
+    verbosity_box = ttk.Combobox(init_frame, values=["0", "1", "2"], width=3, state="readonly")
+    verbosity_box.current(1)
+    verbosity_box.pack(side=tk.LEFT, padx=5)
+
+    # Chuẩn hóa thuộc tính trước khi phân cụm; mô hình của lần chạy gần nhất có thể lưu ra file .npz
+    standardize_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(init_frame, text="Chuẩn hóa", variable=standardize_var).pack(side=tk.LEFT, padx=5)
+    last_model = {"model": None}
+
     def load_data():
-        filepath = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+        filepath = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls"), ("NumPy feature files", "*.npy")])
         if not filepath:
             return None
+        if filepath.lower().endswith(".npy"):
+            return filepath
         try:
             data = pd.read_excel(filepath)
             return data
@@ -133,22 +700,45 @@ def run_kohonen():
 
     def start_algorithm():
         n_clusters = int(cluster_entry.get())
+        batch_size = int(batch_entry.get())
+        n_init = int(n_init_entry.get())
+        init = None if init_box.get() == "mặc định" else init_box.get()
         data = load_data()
         if data is None:
             return
 
         # Thông số tham số
-        learning_rate = 0.4  # Tốc độ học
-        epochs = 5  # Số lần lặp
+        max_iter = 300  # Số vòng lặp tối đa
+
+        verbosity = int(verbosity_box.get())
+        dump_path = None
+        if verbosity >= 2:
+            dump_path = filedialog.asksaveasfilename(title="Lưu chi tiết tiến trình", defaultextension=".txt",
+                                                     filetypes=[("Text files", "*.txt")]) or None
 
         # Xóa nội dung cũ
         text_box.delete(1.0, tk.END)
         # Chạy thuật toán Kohonen
-        kohonen_algorithm(data, n_clusters, learning_rate, epochs, text_box)
+        last_model["model"] = kohonen_algorithm(data, n_clusters, max_iter, text_box, mode=mode_box.get(),
+                                                batch_size=batch_size, init=init, n_init=n_init,
+                                                verbosity=verbosity, dump_path=dump_path,
+                                                standardize=standardize_var.get())
+
+    def save_current_model():
+        if last_model["model"] is None:
+            text_box.insert(tk.END, "Chưa có mô hình để lưu, hãy chạy thuật toán trước.\n")
+            return
+        path = filedialog.asksaveasfilename(title="Lưu mô hình", defaultextension=".npz",
+                                            filetypes=[("NumPy model files", "*.npz")])
+        if path:
+            save_model(last_model["model"], path)
+            text_box.insert(tk.END, f"Đã lưu mô hình vào {path}\n")
 
     # Nút tải dữ liệu và bắt đầu
     load_button = tk.Button(root, text="Tải dữ liệu Excel", command=start_algorithm)
     load_button.pack(pady=5)
+    save_button = tk.Button(root, text="Lưu mô hình", command=save_current_model)
+    save_button.pack(pady=5)
 
     root.mainloop()
 